@@ -0,0 +1,56 @@
+"""
+compare measurements per second of start/stop acquisition against continuous acquisition
+runs against a live yaqd-pi-proem daemon; leaves the daemon in start/stop mode
+"""
+
+import time
+
+import click
+import yaqc
+
+
+def wait_for(cam, measurement_id):
+    while cam.get_measurement_id() < measurement_id:
+        time.sleep(0.001)
+
+
+def rate(cam, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        wait_for(cam, cam.measure())
+    return n / (time.perf_counter() - start)
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", help="host of yaqd-pi-proem. defaults to 127.0.0.1")
+@click.option("--measurements", "-n", default=50, help="measurements per mode")
+@click.option("--exposure-time", "-e", default=10.0, help="exposure time (ms)")
+@click.option("--readout-count", "-r", default=1, help="readouts per measurement")
+@click.argument("port", type=int)
+def main(port, host, measurements, exposure_time, readout_count):
+    cam = yaqc.Client(port=port, host=host)
+    cam.stop_continuous()
+    cam.set_exposure_time(exposure_time)
+    cam.set_readout_count(readout_count)
+    while cam.get_continuous():
+        time.sleep(0.01)
+    wait_for(cam, cam.measure())  # parameters are committed before measuring
+
+    start_stop = rate(cam, measurements)
+
+    cam.start_continuous()
+    while not cam.get_continuous():
+        time.sleep(0.01)
+    continuous = rate(cam, measurements)
+    fps = cam.get_frames_per_second()
+    cam.stop_continuous()
+
+    ideal = 1e3 / (exposure_time * readout_count)
+    print(f"exposure {exposure_time} ms x {readout_count} readouts (ideal {ideal:0.1f} /s)")
+    print(f"start/stop:  {start_stop:0.2f} measurements/s")
+    print(f"continuous:  {continuous:0.2f} measurements/s ({fps:0.1f} frames/s)")
+    print(f"speedup:     {continuous / start_stop:0.2f}x")
+
+
+if __name__ == "__main__":
+    main()
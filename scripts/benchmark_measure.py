@@ -0,0 +1,174 @@
+"""
+benchmark the measure pipeline against the simulated camera, over a grid of settings
+runs the daemon in process (no PICam, no network) and writes results to JSON for comparing releases
+
+for each ROI size, binning, readout count, and exposure time, reports:
+- wall time of measure, and overhead beyond the ideal acquisition time of the simulated camera
+- time of set_roi and of the first measure after a change (which commits parameters)
+- peak RSS during the measurements (Linux; otherwise the process peak so far)
+- latency of get_measured calls made concurrently with measuring, as the event loop serves them
+  (network and serialization are excluded; use benchmark_continuous.py against a live daemon for those)
+"""
+
+import asyncio
+import itertools
+import json
+import pathlib
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import click
+import numpy as np
+
+from yaqd_pi import __version__
+from yaqd_pi._pi_proem import PiProem
+
+
+def reset_peak_rss():
+    try:
+        pathlib.Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        for line in pathlib.Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1e3
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+async def poll(daemon, interval, latencies, stop):
+    """call get_measured every interval (s), recording how late each call completes"""
+    while not stop.is_set():
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        daemon.get_measured()
+        latencies.append(time.perf_counter() - due)
+
+
+async def measure(daemon):
+    start = time.perf_counter()
+    daemon.measure()
+    await daemon._not_busy_sig.wait()
+    return time.perf_counter() - start
+
+
+def percentiles(values):
+    values = np.asarray(values) * 1e3  # ms
+    if not values.size:
+        return {}
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+async def run(grid, repeats, poll_interval, simulation):
+    config = PiProem._parse_config(
+        {"benchmark": {"port": 39999, "simulation": simulation, "log_level": "error"}},
+        "benchmark",
+    )
+    daemon = PiProem("benchmark", config, pathlib.Path(tempfile.mkdtemp()) / "config.toml")
+    results = []
+    try:
+        for size, binning, readouts, exposure in grid:
+            roi = dict(left=0, width=size, bottom=512, height=size)
+            roi.update(x_binning=binning, y_binning=binning)
+            start = time.perf_counter()
+            daemon.set_roi(roi)
+            set_roi = time.perf_counter() - start
+            daemon.set_exposure_time(exposure)
+            daemon.set_readout_count(readouts)
+            first = await measure(daemon)  # commits the new parameters
+
+            readout_time = daemon.proem.params.ReadoutTimeCalculation.get_value()
+            # simulated frame transfer: the first readout takes exposure + readout, then one per period
+            ideal = (exposure + readout_time + (readouts - 1) * max(exposure, readout_time)) / 1e3
+
+            reset_peak_rss()
+            latencies: list[float] = []
+            stop = asyncio.Event()
+            poller = asyncio.ensure_future(poll(daemon, poll_interval, latencies, stop))
+            walls = [await measure(daemon) for _ in range(repeats)]
+            stop.set()
+            await poller
+            wall = float(np.median(walls))
+            result = {
+                "roi_size": size,
+                "binning": binning,
+                "readout_count": readouts,
+                "exposure_time_ms": exposure,
+                "readout_time_ms": readout_time,
+                "wall_s": wall,
+                "ideal_s": ideal,
+                "overhead_s": wall - ideal,
+                "overhead_per_readout_ms": (wall - ideal) / readouts * 1e3,
+                "first_measure_s": first,
+                "set_roi_ms": set_roi * 1e3,
+                "peak_rss_mb": peak_rss_mb(),
+                "get_measured_latency_ms": percentiles(latencies),
+                "phases_p50": daemon.get_acquisition_stats().get("p50", {}),
+            }
+            results.append(result)
+            print(
+                f"roi {size:4d} bin {binning} readouts {readouts:5d} exposure {exposure:6.1f} ms: "
+                f"wall {wall:8.3f} s, overhead {result['overhead_s'] * 1e3:8.2f} ms, "
+                f"rss {result['peak_rss_mb']:7.1f} MB, "
+                f"get_measured p99 {result['get_measured_latency_ms'].get('p99', 0):6.2f} ms"
+            )
+    finally:
+        daemon.close()
+    return results
+
+
+def ints(text):
+    return [int(x) for x in text.split(",")]
+
+
+def floats(text):
+    return [float(x) for x in text.split(",")]
+
+
+@click.command()
+@click.option("--roi-sizes", default="64,128,256,512", help="comma separated ROI sizes (pixels)")
+@click.option("--binnings", default="1,2,4", help="comma separated binnings, applied to x and y")
+@click.option("--readout-counts", default="1,16,128,1024", help="comma separated readout counts")
+@click.option("--exposure-times", default="1,10", help="comma separated exposure times (ms)")
+@click.option("--repeats", "-r", default=3, help="measurements per grid point")
+@click.option("--poll-interval", default=0.005, help="seconds between concurrent get_measured")
+@click.option("--output", "-o", default="benchmark_measure.json", help="JSON file to write")
+def main(roi_sizes, binnings, readout_counts, exposure_times, repeats, poll_interval, output):
+    grid = [
+        point
+        for point in itertools.product(
+            ints(roi_sizes), ints(binnings), ints(readout_counts), floats(exposure_times)
+        )
+        if point[0] % point[1] == 0
+    ]
+    # no injected faults; cosmic rays still exercise the rejection stage
+    simulation = {"commit_time": 50.0, "stall_probability": 0.0, "error_probability": 0.0}
+    results = asyncio.run(run(grid, repeats, poll_interval, simulation))
+    report = {
+        "version": __version__,
+        "python": sys.version,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "repeats": repeats,
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {len(results)} results to {output}")
+
+
+if __name__ == "__main__":
+    main()
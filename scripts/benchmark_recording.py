@@ -0,0 +1,54 @@
+"""
+throughput of raw frame recording, without a camera
+reports the time the acquisition thread spends handing off each frame, and the writer rate in MB/s
+"""
+
+import pathlib
+import tempfile
+import time
+
+import click
+import numpy as np
+
+from yaqd_pi._record import FrameRecorder
+
+
+@click.command()
+@click.option("--frames", "-n", default=2000, help="frames to record")
+@click.option("--size", "-s", default=512, help="frame width and height (pixels)")
+@click.option("--buffer-count", "-b", default=256, help="frames that may wait for the writer")
+@click.option(
+    "--fps", default=0.0, help="acquisition frame rate to emulate; 0 for as fast as possible"
+)
+@click.option(
+    "--directory", "-d", default=None, help="where to write; defaults to a temporary directory"
+)
+def main(frames, size, buffer_count, fps, directory):
+    directory = pathlib.Path(directory or tempfile.mkdtemp())
+    recorder = FrameRecorder(directory, buffer_count)
+    source = np.random.default_rng(0).poisson(500, size=(16, size, size)).astype("u2")
+
+    recording = recorder.start("benchmark", {})
+    handoff = 0.0
+    start = time.perf_counter()
+    for i in range(frames):
+        if fps:
+            time.sleep(max(0, start + i / fps - time.perf_counter()))
+        t = time.perf_counter()
+        recording.write(source[i % len(source)], time.time())
+        handoff += time.perf_counter() - t
+    recording.close()
+    recorder.flush()
+    elapsed = time.perf_counter() - start
+    recorder.close()
+
+    mb = recorder.bytes_written / 1e6
+    print(f"{frames} frames of {size}x{size} ({source[0].nbytes / 1e6:0.2f} MB) to {directory}")
+    print(f"handoff:  {handoff / frames * 1e6:0.1f} us/frame on the acquisition thread")
+    print(f"writer:   {mb / recorder.write_time:0.1f} MB/s while writing")
+    print(f"overall:  {mb / elapsed:0.1f} MB/s ({frames / elapsed:0.1f} frames/s)")
+    print(f"dropped:  {recording.dropped}")
+
+
+if __name__ == "__main__":
+    main()
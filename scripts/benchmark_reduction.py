@@ -0,0 +1,118 @@
+"""
+throughput of readout reduction, in the acquisition thread and in reduction_workers processes
+feeds synthetic frames as fast as they are taken, without a camera; for each worker count, reports:
+- frames per second through update and result, and speedup over reducing in this process
+- lateness of a thread ticking every millisecond meanwhile, as a stand-in for the event loop
+  (numpy releases the GIL only part of the time, so in-process reduction delays it)
+- largest difference of the mean from the in-process result
+"""
+
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+import click
+import numpy as np
+
+from yaqd_pi import __version__
+from yaqd_pi._parallel import ReductionPool
+from yaqd_pi._reduce import new_stats
+
+
+def ticker(latencies, stop, interval=1e-3):
+    while not stop.is_set():
+        due = time.perf_counter() + interval
+        time.sleep(interval)
+        latencies.append(time.perf_counter() - due)
+
+
+def reduce(stats, source, frames):
+    latencies: list[float] = []
+    stop = threading.Event()
+    thread = threading.Thread(target=ticker, args=(latencies, stop))
+    thread.start()
+    start = time.perf_counter()
+    for i in range(frames):
+        stats.select(i).update(source[i % len(source)])
+    mean, hot = stats.result()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    return mean, elapsed, np.asarray(latencies) * 1e3
+
+
+@click.command()
+@click.option("--frames", "-n", default=500, help="frames per measurement")
+@click.option("--size", "-s", default=512, help="frame width and height (pixels)")
+@click.option(
+    "--workers", "-w", default="0,1,2,4", help="comma separated worker counts; 0 is in process"
+)
+@click.option("--rejection", default="max_drop", help="none, max_drop, sigma_clip, or median")
+@click.option(
+    "--error-channels/--no-error-channels", default=False, help="also accumulate variance"
+)
+@click.option("--buffer-count", "-b", default=64, help="shared memory frame slots")
+@click.option("--repeats", "-r", default=3, help="measurements per worker count")
+@click.option("--output", "-o", default="benchmark_reduction.json", help="JSON file to write")
+def main(frames, size, workers, rejection, error_channels, buffer_count, repeats, output):
+    source = np.random.default_rng(0).poisson(500, size=(16, size, size)).astype("u2")
+    spec = ({"method": rejection}, error_channels, [], 0)
+    reference = None
+    results = []
+    for count in [int(w) for w in workers.split(",")]:
+        pool = ReductionPool(count, buffer_count) if count else None
+        try:
+            runs = []
+            for _ in range(repeats):
+                stats = pool.stats(*spec) if pool is not None else new_stats(*spec)
+                runs.append(reduce(stats, source, frames))
+        finally:
+            if pool is not None:
+                pool.close()
+        mean, _, _ = runs[-1]
+        if reference is None:
+            reference = mean
+        elapsed = float(np.median([run[1] for run in runs]))
+        latencies = np.concatenate([run[2] for run in runs])
+        result = {
+            "workers": count,
+            "seconds": elapsed,
+            "frames_per_second": frames / elapsed,
+            "speedup": results[0]["seconds"] / elapsed if results else 1.0,
+            "tick_lateness_ms": {
+                "p50": float(np.percentile(latencies, 50)),
+                "p99": float(np.percentile(latencies, 99)),
+                "max": float(latencies.max()),
+            },
+            "max_difference": float(np.abs(mean - reference).max()),
+        }
+        results.append(result)
+        print(
+            f"workers {count:2d}: {result['frames_per_second']:8.1f} frames/s, "
+            f"speedup {result['speedup']:5.2f}, "
+            f"tick lateness p99 {result['tick_lateness_ms']['p99']:6.2f} ms, "
+            f"max difference {result['max_difference']:g}"
+        )
+    report = {
+        "version": __version__,
+        "python": sys.version,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "frames": frames,
+        "size": size,
+        "rejection": rejection,
+        "error_channels": error_channels,
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {len(results)} results to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -24,17 +24,16 @@ def main(port: int, host):
     cam = yaqc.Client(port=port, host=host)
 
     logger.info(cam)
-    x = cam.get_mappings()["x_index"]
-    y = cam.get_mappings()["y_index"]
 
     fig, (ax, opt1, opt2, opt3) = plt.subplots(
         nrows=4, height_ratios=[10, 1, 1, 1], gridspec_kw={"hspace": 0.05}, layout="tight"
     )
 
-    try:
-        y0 = cam.get_measured()["mean"]
-    except KeyError:
-        y0 = np.zeros((x * y).shape)
+    # the preview is fed by whatever the camera is doing (e.g. a scan calling measure),
+    # so watching it never competes with other clients for measurements
+    y0 = cam.get_preview()
+    if not y0.size:
+        y0 = np.zeros((1, 1))
     art = ax.matshow(y0, cmap="viridis")
     fig.colorbar(art, ax=ax)
 
@@ -44,47 +43,44 @@ def main(port: int, host):
     acquisition = Slider(
         opt2, "acquisitions (2^x)", 0, 8, valinit=int(np.log2(cam.get_readout_count())), valstep=1
     )
-    measure_button = CheckButtons(
+    continuous_button = CheckButtons(
         opt3,
-        labels=["call measure"],
+        labels=["continuous"],
+        actives=[cam.get_continuous()],
         label_props=dict(fontsize=[20]),
         frame_props=dict(facecolor="white"),
     )
 
-    state = {"current": 0, "next": 0}
-    title = "ID {}"
-
-    def update_plot(data):
-        if ax.get_title() != title.format(data["measurement_id"]):
-            try:
-                ax.set_title(f"ID {data['measurement_id']}")
-                if data["measurement_id"]:
-                    art.set_data(data["mean"].clip(min=600))
-                    art.set_norm(norm())
-            except Exception as e:
-                logger.error("", exc_info=e, stack_info=True)
-                return
-            fig.canvas.draw_idle()
-
-    def submit(measure=False):
-        try:
-            if "call measure" in measure_button.get_checked_labels() or measure:
-                if state["current"] >= state["next"]:
-                    state["next"] = cam.measure()
-            measured = cam.get_measured()
-            state["current"] = measured["measurement_id"]
-            if state["current"]:
-                update_plot(measured)
-        except Exception as e:
-            logger.error(state, exc_info=e)
-            if e == ConnectionError or e == ConnectionRefusedError:
-                pass
+    state = {"id": 0}
+
+    def update_plot():
+        stats = cam.get_preview_stats()
+        if not stats or stats["id"] == state["id"]:
+            return
+        state["id"] = stats["id"]
+        art.set_data(cam.get_preview())
+        # robust color limits, so hot pixels and cosmic rays do not wash out the image
+        art.set_norm(norm(vmin=stats["p01"], vmax=max(stats["p99"], stats["p01"] + 1)))
+        ax.set_title(
+            f"preview {int(stats['id'])}  min {stats['min']:.0f}  max {stats['max']:.0f}"
+            f"  age {stats['age']:.1f} s"
+        )
+        fig.canvas.draw_idle()
 
     timer = fig.canvas.new_timer(interval=200)
 
     @timer.add_callback
     def update():
-        submit()
+        try:
+            update_plot()
+        except Exception as e:
+            logger.error(state, exc_info=e)
+
+    def toggle_continuous(label):
+        if continuous_button.get_status()[0]:
+            cam.start_continuous()
+        else:
+            cam.stop_continuous()
 
     def update_integration_time(arg):
         print(f"updating to {arg}")
@@ -95,6 +91,7 @@ def main(port: int, host):
 
     integration.on_changed(update_integration_time)
     acquisition.on_changed(update_acquisition)
+    continuous_button.on_clicked(toggle_continuous)
 
     timer.start()
     plt.show()
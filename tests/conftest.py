@@ -0,0 +1,27 @@
+import pathlib
+
+import pytest
+
+from yaqd_pi._pi_proem import PiProem
+
+
+@pytest.fixture(autouse=True)
+def user_dirs(tmp_path, monkeypatch):
+    """state, dark cache, logs, and recordings go to a temporary directory"""
+    for name in ["DATA", "CACHE", "STATE", "CONFIG"]:
+        monkeypatch.setenv(f"XDG_{name}_HOME", str(tmp_path / name.lower()))
+
+
+@pytest.fixture
+def make_daemon(tmp_path):
+    """make_daemon(**config) -> PiProem on a simulated camera; call in a running event loop"""
+    count = 0
+
+    def make(simulation=None, **config):
+        nonlocal count
+        count += 1
+        name = f"test-{count}"
+        config = dict(port=39999, simulation=simulation or {}, **config)
+        return PiProem(name, PiProem._parse_config({name: config}, name), tmp_path / "config.toml")
+
+    return make
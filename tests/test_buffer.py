@@ -0,0 +1,60 @@
+"""the preallocated acquisition buffer, and readouts lost when it overruns"""
+
+import asyncio
+import time
+
+
+async def measure(daemon, timeout=10):
+    measurement_id = daemon.measure()
+
+    async def wait():
+        while daemon.get_measurement_id() < measurement_id:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(wait(), timeout)
+    return daemon.get_acquisition_stats()["last"]
+
+
+def test_buffer_is_allocated_once(make_daemon):
+    async def run():
+        daemon = make_daemon(acquisition_buffer_readouts=4)
+        try:
+            await asyncio.wait_for(daemon._ready.wait(), 10)
+            daemon.set_readout_count(10)
+            first = await measure(daemon)
+            memory = daemon._buffer.memory
+            second = await measure(daemon)
+            assert daemon._buffer.memory is memory
+            assert memory.nbytes == 4 * daemon.proem.params.ReadoutStride.get_value()
+            assert len(daemon.proem.buffer) == 4
+            return first, second
+        finally:
+            daemon.close()
+
+    for stats in asyncio.run(run()):
+        assert stats["readouts"] == 10
+        assert "overruns" not in stats
+
+
+def test_overrun_is_counted(make_daemon, caplog):
+    async def run():
+        daemon = make_daemon(acquisition_buffer_readouts=2)
+        try:
+            await asyncio.wait_for(daemon._ready.wait(), 10)
+            daemon.set_readout_count(10)
+            daemon.set_exposure_time(10.0)
+            poll_sensor = daemon._poll_sensor
+
+            def slow():  # readouts pile up while the acquisition thread is away
+                time.sleep(0.1)
+                poll_sensor()
+
+            daemon._poll_sensor = slow
+            return await measure(daemon, timeout=20)
+        finally:
+            daemon.close()
+
+    stats = asyncio.run(run())
+    assert stats["readouts"] == 10
+    assert stats["overruns"] > 0
+    assert "acquisition buffer overrun" in caplog.text
@@ -0,0 +1,107 @@
+"""measurements taken from the free-running stream"""
+
+import asyncio
+import threading
+import time
+
+
+async def wait_for_measurement(daemon, measurement_id, timeout=10):
+    async def wait():
+        while daemon.get_measurement_id() < measurement_id:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(wait(), timeout)
+
+
+def test_stop_continuous_during_measurement(make_daemon):
+    async def run():
+        daemon = make_daemon()
+        try:
+            await asyncio.wait_for(daemon._ready.wait(), 10)
+            daemon.set_exposure_time(10.0)
+            daemon.set_readout_count(100)
+            daemon.start_continuous()
+            while not daemon.get_continuous():
+                await asyncio.sleep(0.01)
+            measurement_id = daemon.measure()
+            await asyncio.sleep(0.3)
+            daemon.stop_continuous()
+            await wait_for_measurement(daemon, measurement_id)
+            stopped = daemon.get_acquisition_stats()["last"]
+            assert not daemon._busy
+            # the daemon still measures, now without the stream
+            measurement_id = daemon.measure()
+            await wait_for_measurement(daemon, measurement_id)
+            return stopped, daemon.get_acquisition_stats()["last"]
+        finally:
+            daemon.close()
+
+    stopped, after = asyncio.run(run())
+    assert 0 < stopped["readouts"] < 100
+    assert stopped["dropped_readouts"] == 100 - stopped["readouts"]
+    assert after["readouts"] == 100
+
+
+def test_window_readouts(make_daemon):
+    async def run():
+        daemon = make_daemon()
+        try:
+            await asyncio.wait_for(daemon._ready.wait(), 10)
+            daemon.set_exposure_time(2.0)
+            daemon.set_readout_count(25)
+            daemon.start_continuous()
+            while not daemon.get_continuous():
+                await asyncio.sleep(0.01)
+            measurement_id = daemon.measure()
+            await wait_for_measurement(daemon, measurement_id)
+            return daemon.get_acquisition_stats()["last"], daemon.get_continuous()
+        finally:
+            daemon.close()
+
+    last, continuous = asyncio.run(run())
+    assert continuous
+    assert "window" in last
+    assert last["readouts"] == 25
+    assert last["dropped_readouts"] == 0
+
+
+def worker_threads(daemon):
+    return [t for t in threading.enumerate() if t.name.startswith(f"{daemon.name}-picam")]
+
+
+def test_close_while_streaming(make_daemon, caplog):
+    async def run():
+        daemon = make_daemon()
+        await asyncio.wait_for(daemon._ready.wait(), 10)
+        daemon.start_continuous()
+        while not daemon.get_continuous():
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)
+        camera = daemon.proem
+        daemon.close()
+        return daemon, camera
+
+    daemon, camera = asyncio.run(run())
+    assert not worker_threads(daemon)  # close waited for the stream to stop
+    time.sleep(0.2)
+    assert "continuous acquisition failed" not in caplog.text
+    assert not camera._dev.running
+    assert daemon._camera_serial is None
+
+
+def test_close_during_measurement(make_daemon):
+    async def run():
+        daemon = make_daemon()
+        await asyncio.wait_for(daemon._ready.wait(), 10)
+        daemon.set_exposure_time(10.0)
+        daemon.set_readout_count(1000)
+        daemon.measure()
+        await asyncio.sleep(0.3)
+        start = time.monotonic()
+        daemon.close()
+        return time.monotonic() - start, daemon
+
+    elapsed, daemon = asyncio.run(run())
+    assert elapsed < 1  # the acquisition stops at its next readout, not after all of them
+    assert not worker_threads(daemon)
+    assert daemon._camera_serial is None
@@ -0,0 +1,85 @@
+"""pending parameter values, and how the daemon recovers when the camera rejects them"""
+
+import asyncio
+
+
+async def wait_until_idle(daemon, timeout=10):
+    async def wait():
+        await asyncio.sleep(0.05)
+        while daemon._busy:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(wait(), timeout)
+
+
+def test_rejected_value_is_dropped(make_daemon):
+    async def run():
+        daemon = make_daemon()
+        try:
+            await asyncio.wait_for(daemon._ready.wait(), 10)
+            daemon.set_readout_count(2)
+            daemon.set_adc_speed(3.0)  # not one of the simulated camera's speeds
+            measurement_id = daemon.measure()
+            await wait_until_idle(daemon)
+            return measurement_id, daemon.get_measurement_id(), daemon.get_adc_speed()
+        finally:
+            daemon.close()
+
+    measurement_id, measured, adc_speed = asyncio.run(run())
+    assert measured == measurement_id
+    assert adc_speed == 10.0
+
+
+def test_failed_commit_is_reverted(make_daemon):
+    async def run():
+        daemon = make_daemon()
+        try:
+            await asyncio.wait_for(daemon._ready.wait(), 10)
+            daemon.set_readout_count(2)
+            daemon.set_exposure_time(5.0)
+            # the simulated camera fails the commit: the width is not a multiple of the binning
+            daemon.set_roi(dict(width=63, x_binning=2))
+            daemon.measure()
+            await wait_until_idle(daemon)
+            failed = daemon.get_measurement_id()
+            values = daemon.get_exposure_time(), daemon.get_roi()["width"]
+            daemon.set_exposure_time(2.0)
+            measurement_id = daemon.measure()
+            await wait_until_idle(daemon)
+            return failed, values, measurement_id, daemon.get_measurement_id()
+        finally:
+            daemon.close()
+
+    failed, (exposure_time, width), measurement_id, measured = asyncio.run(run())
+    assert failed == 0
+    assert exposure_time == 10.0  # the whole batch is reverted
+    assert width == 512
+    assert measured == measurement_id == 1
+
+
+def test_stop_looping_undoes_staged_settings(make_daemon):
+    async def run():
+        daemon = make_daemon()
+        try:
+            await asyncio.wait_for(daemon._ready.wait(), 10)
+            daemon.set_readout_count(2)
+            daemon.set_exposure_time(5.0)
+            daemon.queue_measurements([dict(exposure_time=7.0), dict(exposure_time=9.0)])
+            # the second entry is committed while the first is reduced
+            while daemon._prepared is None:
+                await asyncio.sleep(0.001)
+            daemon.stop_looping()
+            await wait_until_idle(daemon)
+            stopped = daemon.get_measurement_id(), daemon.get_exposure_time()
+            daemon.measure()
+            await wait_until_idle(daemon)
+            committed = daemon.proem.params.ExposureTime.get_value()
+            return stopped, daemon.get_measurement_id(), committed
+        finally:
+            daemon.close()
+
+    (stopped, exposure_time), measured, committed = asyncio.run(run())
+    assert stopped == 1
+    assert exposure_time == 7.0
+    assert measured == 2
+    assert committed == 7.0
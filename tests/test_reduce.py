@@ -0,0 +1,91 @@
+"""streaming reduction of readouts"""
+
+import numpy as np
+import pytest
+
+from yaqd_pi._parallel import ReductionPool
+from yaqd_pi._reduce import new_stats
+
+MAX_DROP = {"method": "max_drop", "offset": 400.0, "ratio": 3.0, "floor": 800.0}
+SIGMA_CLIP = {"method": "sigma_clip", "sigma": 5.0, "min_readouts": 16}
+
+
+def reduce(readouts, rejection):
+    stats = new_stats(rejection, False, [])
+    for frame in readouts:
+        stats.update(frame)
+    return stats.result()
+
+
+def test_sigma_clip_leaves_clean_data():
+    rng = np.random.default_rng(0)
+    readouts = rng.poisson(500, size=(100, 64, 64)).astype("u2")
+    mean, hot = reduce(readouts, SIGMA_CLIP)
+    # a 5 sigma one-sided threshold passes all but ~3e-7 of normal values
+    assert hot.sum() <= 2
+    assert np.allclose(mean, readouts.mean(axis=0), rtol=0, atol=1)
+
+
+def test_sigma_clip_clips_hits():
+    rng = np.random.default_rng(1)
+    clean = rng.poisson(500, size=(100, 64, 64)).astype("u2")
+    readouts = clean.copy()
+    readouts[3, 10, 10] += 5000  # in the seed
+    readouts[40, 20, 30] += 300  # about 13 sigma
+    readouts[50, 5, 5] += 2000  # hit twice
+    readouts[80, 5, 5] += 2000
+    mean, hot = reduce(readouts, SIGMA_CLIP)
+    for pixel in [(10, 10), (20, 30), (5, 5)]:
+        assert hot[pixel]
+        assert abs(mean[pixel] - clean[:, pixel[0], pixel[1]].mean()) < 10
+
+
+def baseline(readouts):
+    """mean and max drop of the reduction before streaming, on readouts[readout][frame][roi]"""
+    readouts = np.asarray(readouts)
+    actual = len(readouts)
+    mean = readouts.mean(axis=(0, 1, 2))
+    if np.prod(readouts.shape[:3]) > 2:
+        maxes = readouts.max(axis=(0, 1, 2))
+        mean_without_max = (mean * actual - maxes) / (actual - 1)
+        hot = ((maxes - 400) / (mean_without_max - 400) > 3) & (maxes > 800)
+        mean[hot] = mean_without_max[hot]
+    return mean
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 50])
+def test_max_drop_matches_baseline(count):
+    rng = np.random.default_rng(count)
+    readouts = rng.poisson(500, size=(count, 32, 48)).astype("u2")
+    readouts[-1, 3, 4] += 5000
+    readouts[0, 10, 20] += 3000
+    mean, hot = reduce(readouts, MAX_DROP)
+    assert np.array_equal(mean, baseline(readouts[:, None, None]))
+    assert hot.any() == (count > 2)
+
+
+def test_pool_matches_in_process():
+    rng = np.random.default_rng(2)
+    readouts = rng.poisson(500, size=(40, 32, 48)).astype("u2")
+    readouts[rng.random(readouts.shape) < 1e-3] += 5000
+    pool = ReductionPool(2, 8)
+    try:
+        for rejection in [MAX_DROP, SIGMA_CLIP, {"method": "median"}, {"method": "none"}]:
+            for classes in [[], ["pumped", "unpumped"]]:
+                expected = new_stats(rejection, True, classes, 1)
+                actual = pool.stats(rejection, True, classes, 1)
+                for i, frame in enumerate(readouts):
+                    expected.select(i).update(frame)
+                    actual.select(i).update(frame)
+                expected_mean, expected_hot = expected.result()
+                mean, hot = actual.result()
+                assert np.array_equal(mean, expected_mean)
+                assert np.array_equal(hot, expected_hot)
+                assert np.array_equal(actual.max, expected.max)
+                spread = zip(actual.spread(hot), expected.spread(expected_hot))
+                for value, expected_value in spread:
+                    assert np.array_equal(value, expected_value, equal_nan=True)
+                for shot in classes:
+                    assert np.array_equal(actual.means[shot], expected.means[shot])
+    finally:
+        pool.close()
@@ -0,0 +1,29 @@
+"""index mappings of the camera roi channel and of software sub-regions"""
+
+import asyncio
+
+import numpy as np
+
+
+def test_binned_indices_agree(make_daemon):
+    async def run():
+        sub = dict(name="sub", left=128, width=64, bottom=384, height=32, x_binning=1, y_binning=1)
+        daemon = make_daemon(sub_rois=[sub])
+        try:
+            await asyncio.wait_for(daemon._ready.wait(), 10)
+            daemon.set_roi(
+                dict(left=64, width=256, bottom=448, height=128, x_binning=2, y_binning=4)
+            )
+            return daemon.get_mappings()
+        finally:
+            daemon.close()
+
+    mappings = asyncio.run(run())
+    # sensor coordinates of the first pixel of each bin
+    assert np.array_equal(mappings["x_index"][0], np.arange(64, 320, 2))
+    assert np.array_equal(mappings["y_index"][:, 0], np.arange(320, 448, 4))
+    # the sub-region channel is a slice of the camera roi channel, and so are its mappings
+    assert np.array_equal(mappings["sub_x_index"][0], np.arange(128, 192, 2))
+    assert np.array_equal(mappings["sub_y_index"][:, 0], np.arange(352, 384, 4))
+    assert np.isin(mappings["sub_x_index"], mappings["x_index"]).all()
+    assert np.isin(mappings["sub_y_index"], mappings["y_index"]).all()
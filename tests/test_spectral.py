@@ -0,0 +1,49 @@
+"""wavelength mapping against the interpolated grating equation of scripts/spectrometer_mapping.py"""
+
+import pathlib
+import runpy
+
+import numpy as np
+import pytest
+
+from yaqd_pi._spectral import wavelengths
+
+pytest.importorskip("scipy")
+
+SCRIPT = pathlib.Path(__file__).parents[1] / "scripts" / "spectrometer_mapping.py"
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return runpy.run_path(str(SCRIPT))
+
+
+@pytest.mark.parametrize(
+    "start, pixels, binning",
+    [
+        (0, 448, 1),  # full spectral range
+        (0, 448, 4),  # binned
+        (100, 200, 1),  # offset
+        (51, 300, 3),  # offset and binned
+    ],
+)
+def test_wavelengths_match_reference(reference, start, pixels, binning):
+    spec = reference["spec"]
+    # the reference refracts into the grating; wavelengths takes the angle after refraction
+    aoi = np.arcsin(spec["grating_refractive_index"] * np.sin(np.radians(spec["grating_aoi_deg"])))
+    out = wavelengths(
+        spec["gpmm"],
+        float(np.degrees(aoi)),
+        spec["focal_length"],
+        float(reference["xs"].min()),  # the reference counts pixels from the minimum position
+        1,
+        reference["mm_per_pixel"],
+        start,
+        pixels,
+        binning,
+    )
+    # a binned pixel averages the unbinned pixels it covers; dispersion is nearly linear
+    expected = reference["g"](start + np.arange(pixels)) * 1000  # nm
+    expected = expected.reshape(-1, binning).mean(axis=1)
+    assert out.shape == expected.shape
+    np.testing.assert_allclose(out, expected, atol=1e-2)
@@ -0,0 +1,29 @@
+"""background telemetry keeps sampling the sensor while the camera acquires"""
+
+import asyncio
+import time
+
+import numpy as np
+
+
+def test_telemetry_during_continuous(make_daemon):
+    async def run():
+        daemon = make_daemon(
+            simulation={"commit_time": 1000.0, "cooldown_time": 30.0},
+            temperature_refresh_interval=0.2,
+        )
+        try:
+            await asyncio.wait_for(daemon._ready.wait(), 10)
+            daemon.start_continuous()
+            await asyncio.sleep(3.0)  # one commit to start the stream, then 2 s of streaming
+            assert daemon.get_continuous()
+            latest = daemon.get_telemetry()
+            return time.time() - latest["time"], daemon.get_telemetry_history()
+        finally:
+            daemon.close()
+
+    age, history = asyncio.run(run())
+    assert age < 1.0
+    assert history["continuous"][-5:].all()
+    # the sensor is read live, so it keeps cooling between commits
+    assert (np.diff(history["temperature"][-5:]) < 0).all()
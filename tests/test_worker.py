@@ -0,0 +1,34 @@
+"""the event loop keeps serving requests while the worker thread acquires"""
+
+import asyncio
+import time
+
+import numpy as np
+
+
+def test_measure_does_not_block_event_loop(make_daemon):
+    async def run():
+        daemon = make_daemon()
+        try:
+            await asyncio.wait_for(daemon._ready.wait(), 10)
+            assert daemon.get_ready()
+            daemon.set_exposure_time(10.0)
+            daemon.set_readout_count(100)
+            start = time.perf_counter()
+            measurement_id = daemon.measure()
+            gaps = []
+            while daemon.get_measurement_id() < measurement_id:
+                tick = time.perf_counter()
+                await asyncio.sleep(0)
+                daemon.get_measured()
+                gaps.append(time.perf_counter() - tick)
+            elapsed = time.perf_counter() - start
+        finally:
+            daemon.close()
+        return elapsed, np.array(gaps)
+
+    elapsed, gaps = asyncio.run(run())
+    assert elapsed > 1.0  # 100 readouts of 10 ms
+    assert np.percentile(gaps, 99) < 1e-3
+    # the worst gap is one slice of the worker's time when both threads share a core
+    assert gaps.max() < 0.02, f"event loop blocked for {gaps.max():0.3f} s"
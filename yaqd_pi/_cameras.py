@@ -0,0 +1,145 @@
+"""
+cameras shared by the daemons of one process
+every section of a config file runs as a daemon in the same process, so PICam is loaded once;
+each daemon opens one camera, chosen by serial number, and no camera is opened twice
+"""
+
+__all__ = ["serial_of", "open_camera", "release_camera", "AcquisitionBuffer", "StartGroup"]
+
+import asyncio
+import ctypes
+import ctypes.util
+import threading
+
+import numpy as np
+
+_claimed: dict[str, str] = {}  # serial: name of the daemon that opened it
+_lock = threading.Lock()
+
+
+def serial_of(instrument) -> str:
+    """serial number of an entry of list_instruments"""
+    serial = instrument["serial"]
+    return serial.decode() if isinstance(serial, bytes) else str(serial)
+
+
+def open_camera(instruments: list, serial: str, name: str):
+    """create the camera with the given serial ("" for the first not already opened)
+
+    returns (camera, serial); raises LookupError if no such camera is available
+    """
+    serials = [serial_of(instrument) for instrument in instruments]
+    with _lock:
+        if serial:
+            if serial not in serials:
+                raise LookupError(f"no camera with serial {serial}; found {serials}")
+            if serial in _claimed:
+                raise LookupError(f"camera {serial} is already opened by {_claimed[serial]}")
+        else:
+            free = [s for s in serials if s not in _claimed]
+            if not free:
+                raise LookupError(f"no camera available; found {serials}, opened {_claimed}")
+            serial = free[0]
+        _claimed[serial] = name
+    try:
+        return instruments[serials.index(serial)].create(), serial
+    except BaseException:
+        release_camera(serial)
+        raise
+
+
+def release_camera(serial: str):
+    with _lock:
+        _claimed.pop(serial, None)
+
+
+class AcquisitionBuffer:
+    """preallocated circular buffer, of a number of readouts, that the camera acquires into
+
+    the memory is allocated once per readout size (ReadoutStride, bytes), not per acquisition
+    it must be attached while no acquisition is running
+    """
+
+    def __init__(self, readouts: int):
+        self.readouts = readouts
+        self.memory: np.ndarray | None = None
+
+    def attach(self, camera, stride: int):
+        """size the buffer for readouts of stride bytes, and hand it to the camera if it changed"""
+        if self.memory is not None and self.memory.nbytes == self.readouts * stride:
+            return
+        memory = np.zeros(self.readouts * stride, dtype="u1")  # zeros touches every page now
+        set_buffer = getattr(camera, "set_acquisition_buffer", None)  # simulated camera
+        if set_buffer is None:
+            _set_picam_buffer(camera, memory)
+        else:
+            set_buffer(memory)
+        self.memory = memory  # PICam keeps a pointer: keep the memory alive while it is attached
+
+
+class _PicamAcquisitionBuffer(ctypes.Structure):
+    _fields_ = [("memory", ctypes.c_void_p), ("memory_size", ctypes.c_int64)]
+
+
+def _set_picam_buffer(camera, memory: np.ndarray):
+    """PicamAdvanced_SetAcquisitionBuffer, which instrumental does not wrap"""
+    name = ctypes.util.find_library("picam") or ctypes.util.find_library("Picam")
+    if name is None:
+        raise OSError("PICam library not found")
+    lib = ctypes.CDLL(name)
+    handle = ctypes.c_void_p(int(camera._ffi.cast("uintptr_t", camera._dev._handles[0])))
+    device = ctypes.c_void_p()
+    error = lib.PicamAdvanced_GetCameraDevice(handle, ctypes.byref(device))
+    if error:
+        raise OSError(f"PicamAdvanced_GetCameraDevice failed with error {error}")
+    buffer = _PicamAcquisitionBuffer(memory.ctypes.data, memory.nbytes)
+    error = lib.PicamAdvanced_SetAcquisitionBuffer(device, ctypes.byref(buffer))
+    if error:
+        raise OSError(f"PicamAdvanced_SetAcquisitionBuffer failed with error {error}")
+
+
+class StartGroup:
+    """daemons whose measurements start acquiring together
+
+    a measurement waits (after committing parameters) until every member has a measurement waiting,
+    then all start at once; if the others do not arrive within the timeout, it starts alone
+    members share the event loop of the process
+    """
+
+    _groups: dict[str, "StartGroup"] = {}
+
+    def __init__(self):
+        self.members: set[str] = set()
+        self._waiting: set[str] = set()
+        self._released: asyncio.Event | None = None
+
+    @classmethod
+    def join(cls, group: str, member: str) -> "StartGroup":
+        out = cls._groups.setdefault(group, cls())
+        out.members.add(member)
+        return out
+
+    def leave(self, member: str):
+        self.members.discard(member)
+        self._waiting.discard(member)
+        self._release_if_ready()
+
+    def _release_if_ready(self):
+        if self._released is not None and self._waiting >= self.members:
+            self._released.set()
+            self._released = None
+            self._waiting = set()
+
+    async def start(self, member: str, timeout: float) -> bool:
+        """wait for the other members; False if the timeout passed first"""
+        if self._released is None:
+            self._released = asyncio.Event()
+        released = self._released
+        self._waiting.add(member)
+        self._release_if_ready()
+        try:
+            await asyncio.wait_for(released.wait(), timeout)
+        except asyncio.TimeoutError:
+            self._waiting.discard(member)
+            return False
+        return True
@@ -0,0 +1,74 @@
+"""
+on-disk cache of dark frames, keyed by the acquisition settings they were taken with
+frames are stored as .npy and memory-mapped on use; least recently used frames are evicted
+"""
+
+__all__ = ["DarkCache"]
+
+import hashlib
+import json
+import os
+import pathlib
+import time
+
+import numpy as np
+
+
+class DarkCache:
+    def __init__(self, directory: pathlib.Path, max_bytes: float, max_age: float):
+        """
+        max_bytes bounds the disk use of stored frames
+        max_age (seconds) is how long a dark is considered current
+        """
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._open: dict[str, np.ndarray] = {}  # memory-mapped frames by digest
+
+    @staticmethod
+    def digest(key: dict) -> str:
+        return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:20]
+
+    def get(self, key: dict) -> tuple[np.ndarray | None, str]:
+        """dark frame for these settings (or None), and its status: current, stale, or missing"""
+        digest = self.digest(key)
+        path = self.directory / f"{digest}.npy"
+        if not path.exists():
+            self._open.pop(digest, None)
+            return None, "missing"
+        if digest not in self._open:
+            self._open[digest] = np.load(path, mmap_mode="r")
+        os.utime(path)  # mark as recently used
+        with open(path.with_suffix(".json")) as f:
+            acquired = json.load(f)["acquired"]
+        status = "current" if time.time() - acquired < self.max_age else "stale"
+        return self._open[digest], status
+
+    def put(self, key: dict, frame: np.ndarray):
+        digest = self.digest(key)
+        path = self.directory / f"{digest}.npy"
+        self._open.pop(digest, None)
+        # write then rename, so a reader never maps a partial file
+        tmp = path.with_suffix(".tmp.npy")
+        np.save(tmp, np.ascontiguousarray(frame, dtype="f8"))
+        os.replace(tmp, path)
+        with open(path.with_suffix(".json"), "w") as f:
+            json.dump({"acquired": time.time(), "settings": key}, f)
+        self._evict()
+
+    def clear(self):
+        self._open.clear()
+        for path in self.directory.glob("*.npy"):
+            path.unlink()
+            path.with_suffix(".json").unlink(missing_ok=True)
+
+    def _evict(self):
+        frames = sorted(self.directory.glob("*.npy"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in frames)
+        while len(frames) > 1 and total > self.max_bytes:  # always keep the newest
+            oldest = frames.pop(0)
+            total -= oldest.stat().st_size
+            self._open.pop(oldest.stem, None)
+            oldest.unlink()
+            oldest.with_suffix(".json").unlink(missing_ok=True)
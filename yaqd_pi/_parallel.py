@@ -0,0 +1,266 @@
+"""
+reduction of readouts in worker processes, for large rois and high readout counts
+frames are copied once into a ring of slots in shared memory; each process folds its band of rows
+of every frame into its own running stats
+every stage (mean, max, variance, rejection, shot classes) is per pixel, so the result is
+the same as reducing in one process
+"""
+
+__all__ = ["ReductionPool", "ParallelStats"]
+
+import collections
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ._reduce import new_stats
+
+# planes of the output block, in camera orientation; then the mean of each shot class
+_OUTPUTS = ["mean", "hot", "max", "variance", "count"]
+
+
+def _serve(connection):
+    """worker process: reduce a band of rows of the frames it is sent, until told to close"""
+    memory: dict[str, shared_memory.SharedMemory] = {}
+    frames = outputs = np.empty((0, 0, 0))  # views into shared memory
+    stats = spec = None
+    while True:
+        command, *args = connection.recv()
+        try:
+            if command == "close":
+                break
+            if command == "begin":
+                frames_spec, outputs_spec, rows, spec = args
+                frames = outputs = np.empty((0, 0, 0))  # release views before closing memory
+                for name in set(memory) - {frames_spec[0], outputs_spec[0]}:
+                    memory.pop(name).close()
+                views = []
+                for name, shape, dtype in [frames_spec, outputs_spec]:
+                    if name not in memory:  # spawned processes share the pool's resource tracker
+                        memory[name] = shared_memory.SharedMemory(name=name)
+                    array = np.ndarray(shape, dtype, buffer=memory[name].buf)
+                    views.append(array[:, rows[0] : rows[1]])
+                frames, outputs = views
+                del views, array
+                stats = new_stats(*spec)
+            elif command == "reduce":
+                for slot, readout in args[0]:
+                    stats.select(readout).update(frames[slot])
+            elif command == "result":
+                mean, hot = stats.result()
+                outputs[0], outputs[1], outputs[2] = mean, hot, stats.max
+                if spec[1]:  # variance
+                    outputs[3], outputs[4] = stats.spread(hot)
+                for i, shot in enumerate(spec[2]):
+                    outputs[len(_OUTPUTS) + i] = stats.means[shot]
+            connection.send(("ok",))
+        except Exception as e:
+            connection.send(("error", e))
+    frames = outputs = np.empty((0, 0, 0))
+    for shm in memory.values():
+        shm.close()
+
+
+class ReductionPool:
+    """worker processes and the shared memory they read frames from and write results to
+
+    one measurement (ParallelStats) uses the pool at a time
+    frames are sent in batches; a slot is reused once every process has reduced its batch
+    """
+
+    def __init__(self, workers: int, buffer_count: int):
+        context = multiprocessing.get_context("spawn")  # this process has threads; do not fork it
+        self.buffer_count = max(int(buffer_count), 2)
+        self.batch = max(1, min(8, self.buffer_count // 4))
+        self._connections = []
+        self._processes = []
+        for i in range(max(int(workers), 1)):
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_serve, args=(child,), name=f"reduction-{i}", daemon=True
+            )
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+        self._active = list(self._connections)  # processes with a band of the current shape
+        self._memory: dict[str, tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+        # views of the current shared arrays
+        self.frames = np.empty((0, 0, 0))
+        self.outputs = np.empty((0, 0, 0))
+        self._outstanding: collections.deque[int] = collections.deque()  # slots per sent batch
+        self._free = self.buffer_count
+        self._next = 0
+
+    @property
+    def workers(self) -> int:
+        return len(self._processes)
+
+    def stats(self, rejection: dict, variance: bool, classes: list[str], phase: int = 0):
+        """accumulator for one measurement, with the arguments of new_stats"""
+        return ParallelStats(self, (rejection, variance, list(classes), phase))
+
+    def _allocate(self, key: str, shape: tuple[int, ...], dtype) -> np.ndarray:
+        """shared array of the given shape, reused while the shape is unchanged"""
+        dtype = np.dtype(dtype)
+        if key in self._memory:
+            shm, array = self._memory[key]
+            if array.shape == shape and array.dtype == dtype:
+                return array
+            del self._memory[key], array
+            shm.close()
+            shm.unlink()
+        shm = shared_memory.SharedMemory(
+            create=True, size=max(int(np.prod(shape)), 1) * dtype.itemsize
+        )
+        array = np.ndarray(shape, dtype, buffer=shm.buf)
+        self._memory[key] = (shm, array)
+        return array
+
+    def _spec(self, key: str) -> tuple:
+        shm, array = self._memory[key]
+        return shm.name, array.shape, array.dtype.str
+
+    def _begin(self, shape: tuple[int, ...], dtype, spec: tuple):
+        self._drain()  # batches left by a measurement that failed
+        self.frames = self.outputs = np.empty((0, 0, 0))  # release views before reallocating
+        self.frames = self._allocate("frames", (self.buffer_count, *shape), dtype)
+        self.outputs = self._allocate("outputs", (len(_OUTPUTS) + len(spec[2]), *shape), "f8")
+        bands = np.array_split(np.arange(shape[0]), min(self.workers, shape[0]))
+        self._active = self._connections[: len(bands)]
+        for connection, band in zip(self._active, bands):
+            rows = (int(band[0]), int(band[-1]) + 1)
+            connection.send(("begin", self._spec("frames"), self._spec("outputs"), rows, spec))
+        self._gather()
+
+    def _put(self, frame: np.ndarray) -> int:
+        """copy frame into a free slot, waiting for the processes if none is free"""
+        while not self._free:
+            self._reclaim()
+        slot = self._next
+        np.copyto(self.frames[slot], frame)
+        self._next = (slot + 1) % self.buffer_count
+        self._free -= 1
+        return slot
+
+    def _send(self, items: list[tuple[int, int]]):
+        """reduce frames, as (slot, readout) pairs"""
+        for connection in self._active:
+            connection.send(("reduce", items))
+        self._outstanding.append(len(items))
+
+    def _reclaim(self):
+        """wait for the oldest batch and free its slots"""
+        count = self._outstanding.popleft()
+        self._gather()
+        self._free += count
+
+    def _drain(self):
+        error = None
+        while self._outstanding:
+            try:
+                self._reclaim()
+            except Exception as e:
+                error = e
+        self._free = self.buffer_count
+        self._next = 0
+        return error
+
+    def _gather(self):
+        """one reply from each active process; raises the first error reported"""
+        error = None
+        for connection in self._active:
+            reply = connection.recv()
+            if reply[0] == "error" and error is None:
+                error = reply[1]
+        if error is not None:
+            raise error
+
+    def close(self):
+        for connection in self._connections:
+            try:
+                connection.send(("close",))
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self.frames = self.outputs = np.empty((0, 0, 0))
+        for shm, _ in self._memory.values():
+            shm.close()
+            shm.unlink()
+        self._memory = {}
+
+
+class ParallelStats:
+    """running stats of one measurement, reduced by a ReductionPool
+
+    stands in for a RunningStats (or a ShotStats): update from the acquisition thread,
+    then result and spread once every readout is in
+    """
+
+    def __init__(self, pool: ReductionPool, spec: tuple):
+        self.pool = pool
+        self.spec = spec
+        self.classes = spec[2]
+        self.phase = spec[3]
+        self.count = 0
+        self.means: dict[str, np.ndarray] = {}
+        self._readout = 0
+        self._pending: list[tuple[int, int]] = []  # (slot, readout) not yet sent
+        self._started = False
+        self._outputs: np.ndarray | None = None
+
+    def shot(self, readout: int) -> str | None:
+        if not self.classes:
+            return None
+        return self.classes[(readout + self.phase) % len(self.classes)]
+
+    def select(self, readout: int) -> "ParallelStats":
+        """frames updated next belong to readout (counted from the start of the acquisition)"""
+        self._readout = readout
+        return self
+
+    def update(self, frame: np.ndarray):
+        if not self._started:
+            self.pool._begin(frame.shape, frame.dtype, self.spec)
+            self._started = True
+        self._pending.append((self.pool._put(frame), self._readout))
+        self.count += 1
+        if len(self._pending) >= self.pool.batch:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self.pool._send(self._pending)
+            self._pending = []
+
+    def result(self) -> tuple[np.ndarray, np.ndarray]:
+        """mean over all readouts, and the pixels rejection corrected; blocks for the processes"""
+        if not self.count:
+            raise ValueError("no frames")
+        self._flush()
+        error = self.pool._drain()
+        if error is not None:
+            raise error
+        for connection in self.pool._active:
+            connection.send(("result",))
+        self.pool._gather()
+        self._outputs = self.pool.outputs.copy()  # the pool reuses its outputs
+        for i, shot in enumerate(self.classes):
+            self.means[shot] = self._outputs[len(_OUTPUTS) + i]
+        return self._outputs[0], self._outputs[1].astype(bool)
+
+    def spread(self, hot: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """variance and count, as computed by each process with its own rejection"""
+        if self._outputs is None or not self.spec[1]:
+            raise ValueError("variance was not accumulated")
+        return self._outputs[3], self._outputs[4]
+
+    @property
+    def max(self) -> np.ndarray:
+        if self._outputs is None:
+            raise ValueError("no result yet")
+        return self._outputs[2]
@@ -1,57 +1,141 @@
 __all__ = ["PiProem"]
 
 import asyncio
+import collections
 import numpy as np
+import pathlib
+import platformdirs
+import threading
 import time
 
 from yaqd_core import HasMapping, HasMeasureTrigger, logging
 
-from ._roi import ROI_native, ROI_UI, ui_to_native, native_to_ui
+from ._cameras import AcquisitionBuffer, StartGroup, open_camera, release_camera
+from ._dark import DarkCache
+from ._record import FrameRecorder
+from ._parallel import ReductionPool
+from ._reduce import bin_image, new_stats
+from ._preview import Preview
+from ._ring import FrameRing
+from ._spectral import wavelengths
+from ._telemetry import Telemetry
+from ._transport import freeze, quantize
+from ._timing import MeasurementTiming, TimingHistory
+from ._schedule import ReadoutSchedule
+from ._roi import ROI_native, ROI_UI, Geometry, SubROI, sub_roi_slices
+from ._worker import AcquisitionWorker
 
 root = logging.getLogger("")
 logging.getLogger("nicelib.nicelib").setLevel(logging.WARNING)
 logging.getLogger("instrumental.drivers").setLevel(logging.WARNING)
 
+_DATA_LOST = 0x2  # PicamAcquisitionErrorsMask_DataLost
+# settings a dark frame depends on, besides the sensor temperature
+_DARK_SETTINGS = ["roi", "exposure_time", "adc_speed", "adc_quality", "analog_gain", "em_gain"]
+
 
 class PiProem(HasMapping, HasMeasureTrigger):
     _kind = "pi-proem"
 
     def __init__(self, name, config, config_filepath):
+        # measure may be called from super().__init__ (loop_at_startup)
+        self._startup_error: Exception | None = None
+        # queued measurements (settings for each), and the results of recent measurements
+        self._queued: collections.deque[dict] = collections.deque()
+        self._prepared: asyncio.Future | None = None  # commit of the next queued settings
+        self._unstaged: dict = {}  # values the prepared settings replaced
+        self._loop_requested = False
+        self._results: collections.OrderedDict[int, dict] = collections.OrderedDict()
         super().__init__(name, config, config_filepath)
 
-        if config.get("emulate"):
-            from instrumental.drivers.cameras.picam import sdk
-
-            self.logger.info("Starting Emulated camera")
-            sdk.connect_demo_camera(PicamEnums.Model.ProEMHS512BExcelon, "demo")
-
         # channels
-        self._channel_names = ["mean"]
-        self._channel_units = {"mean": "counts"}
+        self._base_channels = ["mean", "rejected"]
+        # arrays shaped like mean; the rest of the base channels are scalars
+        self._image_channels = ["mean"]
+        if config["error_channels"]:
+            self._base_channels += ["std", "sem", "snr"]
+            self._image_channels += ["std", "sem"]
+        if config["timing_channels"]:
+            self._base_channels += ["measure_time", "frames_per_second"]
+        if config["timing_channels"] or config["sync_group"] is not None:
+            self._base_channels += ["start_time", "end_time"]
+        # readouts demultiplexed into shot classes (e.g. pump on, off), each a channel
+        self._shot_classes = list(config["shot_classes"])
+        self._shot_phase = 0
+        shot_channels = list(self._shot_classes)
+        if len(shot_channels) == 2:
+            shot_channels.append("difference")
+        for name in shot_channels:
+            if name in self._base_channels or shot_channels.count(name) > 1:
+                raise ValueError(f"shot class {name} is not a unique channel name")
+        self._base_channels += shot_channels
+        self._image_channels += shot_channels
+        self._channel_names = list(self._base_channels)
+        self._channel_units = {"mean": "counts", "measure_time": "s", "frames_per_second": "Hz"}
+        self._channel_units.update(start_time="s", end_time="s", std="counts", sem="counts")
+        self._channel_units.update({name: "counts" for name in shot_channels})
         self._channel_mappings = {"mean": ["y_index", "x_index"]}
         self._mapping_units = {"y_index": "None", "x_index": "None"}
 
-        self.logger.info("initializing picam. This can take a few seconds...")
-        from instrumental.drivers.cameras.picam import (
-            list_instruments,
-            PicamError,
-            PicamCamera,
-            PicamEnums,
+        # all blocking SDK calls during operation go through this thread
+        self._worker = AcquisitionWorker(self.name)
+        # preallocated circular buffer the camera acquires into; None for PICam's own
+        buffer_readouts = config["acquisition_buffer_readouts"]
+        self._buffer = AcquisitionBuffer(buffer_readouts) if buffer_readouts > 0 else None
+        # most recent frame and arrival times, fed by any acquisition
+        self._latest = FrameRing(1)
+        self._frame_times: collections.deque = collections.deque(maxlen=64)  # (time, readouts)
+        rate = config["preview_rate"]
+        self._preview = Preview(config["preview_size"], 1 / rate if rate > 0 else np.inf)
+        # continuous acquisition
+        self._stream: asyncio.Future | None = None
+        self._stream_stop = threading.Event()
+        self._window: tuple | None = None  # (stats, readouts wanted, future, recording, timing)
+        # dark frames
+        self._darks = DarkCache(
+            platformdirs.user_cache_path("yaqd-pi", "yaq") / self.name / "darks",
+            max_bytes=config["dark_cache_size"] * 1e6,
+            max_age=config["dark_max_age"] * 3600,
         )
-
-        self.PicamEnums = PicamEnums
-        self.PicamError = PicamError
-        # open camera
-        deviceArray = list_instruments()
-        if len(deviceArray) == 0:
-            raise PicamError("No devices found.")
-        self.proem: PicamCamera = deviceArray[0].create()
-
+        self._store_dark = False
+        self._dark_status = "missing"
+        # parameter values set since the last commit; all are applied in one commit
+        self._pending: dict[str, tuple] = {}  # values for the SDK, by parameter: (setter, value)
+        self._commit_count = 0
+        self._commit_time = 0.0  # s
+        # committed values and enum options, cleared on every commit
+        self._values: dict[str, object] = {}
+        self._options: dict[str, list] = {}
+        # sensor temperature and acquisition health, sampled in the background
+        self._telemetry = Telemetry(
+            config["telemetry_history"],
+            ["temperature", "locked", "busy", "continuous", "frames_per_second"],
+        )
+        self._temperature_status = ""
+        self._locked = asyncio.Event()
+        # live (temperature, status, time.monotonic) read on the worker; see _read_sensor
+        self._sensor: tuple[float, str, float] = (float("nan"), "", -np.inf)
+        self._acquiring = False  # the worker is in an acquisition loop, which reads the sensor
+        self._timing = TimingHistory(config["timing_history"])
+        # raw frame recording
+        self._recorder: FrameRecorder | None = None
+        self._recording = config["record"]
+        self._recordings: collections.OrderedDict[int, str] = collections.OrderedDict()
+        self._group: StartGroup | None = None
+        if config["sync_group"] is not None:
+            self._group = StartGroup.join(config["sync_group"], self.name)
+        # the camera is opened in the background (_startup) while the daemon serves requests
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._camera_serial: str | None = None  # once the camera is open (claimed in the registry)
+        self._geometry = Geometry()  # until the sensor size is read from the camera
+        self._roi = self._geometry.full  # requested roi; set on the camera once it is open
         self._background = set()
-        self.parameters = list(self.proem.params.parameters.keys())
-        self.enum_keys = set(self.get_parameters()) & set(self.PicamEnums._get_enum_dict())
+        self._pool: ReductionPool | None = None  # reduction processes, if reduction_workers
+        self.parameters: list[str] = []
+        self.enum_keys: set[str] = set()
 
-        # register properties
+        # register properties; until the camera is ready, set values are pending
         self.set_exposure_time, self.get_exposure_time, _ = self.gen_param("ExposureTime")
         self.set_readout_count, self.get_readout_count, _ = self.gen_param("ReadoutCount")
         self.set_analog_gain, self.get_analog_gain, self.get_analog_gain_types = self.gen_param(
@@ -62,94 +146,429 @@ class PiProem(HasMapping, HasMeasureTrigger):
         )
         self.set_adc_speed, self.get_adc_speed, _ = self.gen_param("AdcSpeed")
         self.set_em_gain, self.get_em_gain, _ = self.gen_param("AdcEMGain")
-
-        # initialize with default parameters
-        self.set_roi(ROI_UI()._asdict())
+        self.set_trigger_source, self.get_trigger_source, self.get_trigger_source_types = (
+            self.gen_param("TriggerSource")
+        )
+        self.set_trigger_response, self.get_trigger_response, self.get_trigger_response_types = (
+            self.gen_param("TriggerResponse")
+        )
+        (
+            self.set_trigger_determination,
+            self.get_trigger_determination,
+            self.get_trigger_determination_types,
+        ) = self.gen_param("TriggerDetermination")
 
         if self._config["spectrometer"] is not None:
             self.logger.info("we have a spectrometer")
             self._mapping_units["wavelengths"] = "nm"
             self._channel_mappings["mean"].append("wavelengths")
-            self._mappings["wavelengths"] = self._gen_spectral_mapping()
-        self._set_temperature()
+        for name in self._image_channels[1:]:
+            self._channel_mappings[name] = list(self._channel_mappings["mean"])
+
+        # software sub-regions, published as extra channels
+        self._sub_rois = [SubROI(**sub) for sub in config["sub_rois"]]
+        self._sub_slices: dict[str, tuple[slice, slice]] = {}
+
+        self._update_roi(self._roi)
+        self._create_task(self._startup())
+
+    # --- startup -----------------------------------------------------------------------------------
+
+    async def _startup(self):
+        """open the camera and discover its parameters; blocking phases run on the worker"""
+        phases = {}
+        try:
+            for phase, func in [
+                ("import", self._import_sdk),
+                ("open", self._open_camera),
+                ("discover", self._discover_parameters),
+            ]:
+                start = time.perf_counter()
+                await self._worker.run(func)
+                phases[phase] = time.perf_counter() - start
+                if self._closed:
+                    raise RuntimeError("closed during startup")
+            start = time.perf_counter()
+            self._set_camera_roi(self._roi)  # values set before now are pending
+            self._update_roi(self._roi)  # with the wavelengths mapping, now the camera is open
+            self.proem.params.SensorTemperatureSetPoint.set_value(
+                self._config["sensor_temperature_setpoint"]
+            )
+            await self._worker.run(self._commit_parameters)
+            await self._worker.run(self._read_sensor)
+            self._sample_telemetry()
+            phases["configure"] = time.perf_counter() - start
+            if self._config["reduction_workers"] > 0:
+                start = time.perf_counter()
+                self._pool = await self._worker.run(
+                    ReductionPool,
+                    self._config["reduction_workers"],
+                    self._config["reduction_buffer_count"],
+                )
+                phases["reduction"] = time.perf_counter() - start
+        except Exception as e:
+            self._startup_error = e
+            if self._closed:
+                self._close_camera()  # in case it opened after close
+            else:
+                self.logger.error("camera failed to start", exc_info=e)
+            return
+        finally:
+            self._ready.set()
+            self.logger.info(
+                "startup: "
+                + ", ".join(f"{phase} {dt * 1e3:0.0f} ms" for phase, dt in phases.items())
+                + f"; total {sum(phases.values()) * 1e3:0.0f} ms"
+            )
         self.logger.info("initialized.")
+        self._create_task(self._run_telemetry())
+
+    def _import_sdk(self):
+        if self._config["simulation"] is not None:
+            self.logger.info("using a simulated camera")
+            from . import _simulated as picam
+        else:
+            self.logger.info("initializing picam. This can take a few seconds...")
+            from instrumental.drivers.cameras import picam  # type: ignore
+
+            if self._config.get("emulate"):
+                self.logger.info("Starting Emulated camera")
+                picam.sdk.connect_demo_camera(picam.PicamEnums.Model.ProEMHS512BExcelon, "demo")
+        self._picam = picam
+        self.PicamEnums = picam.PicamEnums
+        self.PicamError = picam.PicamError
+
+    def _open_camera(self):
+        if self._config["simulation"] is not None:
+            deviceArray = self._picam.list_instruments(**self._config["simulation"])
+        else:
+            deviceArray = self._picam.list_instruments()
+        if len(deviceArray) == 0:
+            raise self.PicamError("No devices found.")
+        # other config sections of this process may have opened cameras already
+        self.proem, self.serial = open_camera(deviceArray, self._config["serial"] or "", self.name)
+        self._camera_serial = self.serial
+        self.logger.info(f"opened camera {self.serial}")
+
+    def _discover_parameters(self):
+        self.parameters = list(self.proem.params.parameters.keys())
+        self.enum_keys = set(self.parameters) & set(self.PicamEnums._get_enum_dict())
+        params = self.proem.params.parameters
+        if "SensorActiveWidth" in params and "SensorActiveHeight" in params:
+            geometry = Geometry(
+                params["SensorActiveWidth"].get_value(), params["SensorActiveHeight"].get_value()
+            )
+            if self._roi == self._geometry.full:  # not set by a client yet: the whole sensor
+                self._roi = geometry.full
+            self._geometry = geometry
+        self.logger.info(
+            f"sensor {self._geometry.sensor_width} x {self._geometry.sensor_height} pixels"
+        )
+
+    def get_ready(self) -> bool:
+        return self._ready.is_set() and self._startup_error is None
+
+    def _require_ready(self):
+        """raise unless the camera is open; for requests that cannot wait"""
+        if self._startup_error is not None:
+            raise RuntimeError(f"camera failed to start: {self._startup_error!r}")
+        if not self._ready.is_set():
+            raise RuntimeError("camera is not ready yet (see get_ready)")
+
+    async def _wait_ready(self):
+        await self._ready.wait()
+        self._require_ready()
+
+    def measure(self, loop: bool = False) -> int:
+        if self._startup_error is not None:
+            self._require_ready()
+        self._loop_requested = loop
+        return super().measure(loop or bool(self._queued))
+
+    def stop_looping(self):
+        self._queued.clear()
+        self._loop_requested = False
+        if self._prepared is not None:  # staged for a measurement that will not run: undo it
+            self._prepared.add_done_callback(
+                lambda future: future.cancelled() or future.exception()
+            )
+            self._prepared = None
+            self._stage(self._unstaged)
+        super().stop_looping()
 
     async def _measure(self):
-        readouts = []  # readouts[readout][readout_frame][frame roi]
-        self.proem.commit_parameters()
-        expected_readouts = self.get_readout_count()
-        wait = min(self.get_exposure_time(), 50)  # ms
-        timeout = self.get_exposure_time() * 1.2  # ms
+        if not self._ready.is_set():
+            await self._ready.wait()
+        if self._startup_error is not None:  # do not leave the daemon busy
+            self._looping = False
+            self._busy = False
+            self._queued.clear()
+            self._require_ready()
+        settings = self._queued.popleft() if self._queued else None
+        self._looping = bool(self._queued) or self._loop_requested
+        timing = MeasurementTiming()
+        with timing.phase("commit"):
+            try:
+                if self._prepared is not None:  # committed while the previous one was reduced
+                    prepared, self._prepared = self._prepared, None
+                    await prepared
+                elif settings is not None:
+                    self._stage(settings)
+                await self._apply_pending()
+            except Exception as e:  # do not leave the daemon busy
+                self.logger.error("measurement abandoned: parameters not committed", exc_info=e)
+                self._prepared = None
+                self._queued.clear()
+                self._loop_requested = self._looping = False
+                self._busy = False
+                raise e
+            committed = self._committed()
+            sub_slices = self._sub_slices  # replaced, not modified, by roi changes
+        await self._wait_for_lock(timing)
+        dark_key = self._dark_key(committed)
+        stats = self._new_stats()
+        recording = self._start_recording(committed, dark_key) if self._recording else None
+        expected_readouts = committed["readout_count"]
+        actual = 0
+        try:
+            if self._stream is not None:  # take the next readout_count readouts from the stream
+                done = self._loop.create_future()
+                self._window = (stats, expected_readouts, done, recording, timing)
+                with timing.phase("window"):
+                    actual = await done
+                if 0 < actual < expected_readouts:
+                    self.logger.warning(
+                        f"continuous acquisition stopped after {actual} of {expected_readouts} "
+                        "readouts of the measurement"
+                    )
+            if not actual:  # not streaming, or the stream stopped before the first readout
+                if self._group is not None:
+                    with timing.phase("sync"):
+                        if not await self._group.start(self.name, self._config["sync_timeout"]):
+                            self.logger.warning("sync group did not start together; started alone")
+                actual = await self._worker.run(self._acquire, stats, committed, recording, timing)
+        finally:
+            if recording is not None:
+                recording.close()
+        # the worker is free: commit the next queued settings while this measurement is reduced
+        if self._queued and self._queued[0].get("roi") is None:  # roi changes reshape channels
+            self._unstaged = self._stage(self._queued[0])
+            self._prepared = asyncio.ensure_future(self._apply_pending())
+        timing.counts["readouts"] = actual
+        timing.counts["frames"] = stats.count
+        timing.counts["dropped_readouts"] = max(expected_readouts - actual, 0)
+        if recording is not None:
+            timing.counts["recording_dropped"] = recording.dropped
+        # off the event loop, and off the worker, which may be committing the next queued settings
+        store_dark, self._store_dark = self._store_dark, False
+        out = await self._loop.run_in_executor(
+            None, self._reduce, stats, dark_key, store_dark, sub_slices, timing
+        )
+        report = timing.as_dict()
+        self._timing.add(report)
+        self._telemetry.add_measurement(report)
+        self.logger.debug(f"timing: {report}")
+        if self._config["timing_channels"]:
+            out["measure_time"] = report["total"]
+            out["frames_per_second"] = report.get("frames_per_second", 0.0)
+        if "start_time" in self._channel_names:
+            out["start_time"] = timing.times.get("start", np.nan)
+            out["end_time"] = timing.times.get("end", np.nan)
+        # the runner adds measurement_id (and mapping_id) to this same dict
+        self._results[self._measurement_id + 1] = out
+        while len(self._results) > self._config["measurement_history"]:
+            self._results.popitem(last=False)
+        return out
+
+    def _new_stats(self):
+        """accumulator for one measurement, reduced in this process or by the reduction pool"""
+        args = (
+            self._config["rejection"],
+            self._config["error_channels"],
+            self._shot_classes,
+            self._shot_phase,
+        )
+        if self._pool is not None:
+            return self._pool.stats(*args)
+        return new_stats(*args)
+
+    def _reduce(self, stats, key: dict, store_dark: bool, sub_slices: dict, timing) -> dict:
+        """channels of a measurement from its stats; runs in a thread, off the event loop"""
+        with timing.phase("reduce"):
+            mean, hot = stats.result()  # with a reduction pool, waits for its processes
+        self.logger.info(f"readout shape: {mean.shape}, {stats.count} frames")
+        self.logger.info(f"{hot.sum()} hot pixels")
+        self.logger.debug(f"hot values: {stats.max[hot]}, corrected to: {mean[hot]}")
+        with timing.phase("postprocess"):
+            return self._postprocess(mean, hot, stats, key, store_dark, sub_slices)
+
+    def _postprocess(
+        self, mean, hot, stats, key: dict, store_dark: bool, sub_slices: dict
+    ) -> dict:
+        """dark subtraction, sub-regions, and error channels of the reduced mean
 
+        key is the dark key of the settings the readouts were taken with; sub_slices are those of
+        the roi they were taken with
+        """
+        if store_dark:  # publish the dark itself, unsubtracted
+            self._darks.put(key, mean)
+            self.logger.info(f"stored dark for {key}")
+            self._dark_status = "current"
+        else:
+            dark, self._dark_status = self._darks.get(key)
+            if dark is not None and self._config["subtract_dark"]:
+                mean -= dark
+                for shot in self._shot_classes:
+                    stats.means[shot] -= dark
+        # views: the rotation happens in the one copy made for transport, below
+        out = {"mean": self._geometry.orient(mean), "rejected": int(hot.sum())}
+        for shot in self._shot_classes:
+            out[shot] = self._geometry.orient(stats.means[shot])
+        if len(self._shot_classes) == 2:
+            first, second = (stats.means[shot] for shot in self._shot_classes)
+            out["difference"] = self._geometry.orient(first - second)
+        if self._config["error_channels"]:
+            variance, count = stats.spread(hot)
+            std = np.sqrt(variance, out=variance)
+            sem = np.divide(std, np.sqrt(count, out=count), out=count)
+            out["std"], out["sem"] = self._geometry.orient(std), self._geometry.orient(sem)
+            # average signal over the rms standard error of the mean
+            with np.errstate(all="ignore"):
+                out["snr"] = float(np.nanmean(mean) / np.sqrt(np.nanmean(sem**2)))
+        # binning commutes with the mean, so sub-regions are binned once per measurement
+        for sub in self._sub_rois:
+            if sub.name not in sub_slices:
+                continue
+            rows, columns = sub_slices[sub.name]
+            out[sub.name] = bin_image(
+                out["mean"][rows, columns], sub.y_binning, sub.x_binning, sub.full_binning
+            )
+        # arrays are made contiguous (and oriented) once, and their bytes cached for every get_measured
+        transport = self._config["transport"]
+        for name, value in list(out.items()):
+            if not isinstance(value, np.ndarray):
+                continue
+            if transport.startswith("uint"):
+                out[name], out[f"{name}_scale"], out[f"{name}_offset"] = quantize(value, transport)
+            else:
+                out[name] = freeze(value, transport)
+        return out
+
+    def _readouts(self, available_data):
+        """yield the frames (first roi) of each readout in a block of available data
+
+        views into the PICam buffer are only valid until the next update,
+        so every frame must be consumed (or copied) before waiting again
+        """
+        # readouts[readout][readout_frame][frame roi]
+        readouts = self.proem._extract_available_data(available_data, copy=False)
+        for readout in readouts:
+            yield [frame[0] for frame in readout]
+        self._frame_times.append((time.monotonic(), len(readouts)))
+        self._latest.push(readouts[-1][-1][0])
+        self._preview.update(self._geometry.orient(readouts[-1][-1][0]))
+
+    def _acquire(self, stats, committed, recording=None, timing=None):
+        """blocking acquisition loop; runs on the acquisition worker thread
+
+        readouts are folded into stats (and recording) as they arrive; returns the number of readouts
+        committed holds the settings on the camera (see _committed)
+        phase durations and timeouts are accumulated in timing
+        """
+        timing = timing or MeasurementTiming()
+        self._acquiring = True
+        try:
+            with timing.phase("acquire"):
+                return self._acquire_loop(stats, committed, recording, timing)
+        finally:
+            self._acquiring = False
+
+    def _acquire_loop(self, stats, committed, recording, timing):
+        expected_readouts = committed["readout_count"]
+        schedule = ReadoutSchedule(
+            committed["exposure_time"],
+            self._read_only("ReadoutTimeCalculation", 0.0),
+            self._read_only("FramesPerReadout", 1),
+            slack=self._config["readout_deadline_slack"],
+            trigger_period=self._config["trigger_period"] if committed["triggered"] else 0.0,
+        )
         actual = 0
-        while actual < expected_readouts:  # reattempt acquisition if we didn't get what we want
+        # reattempt acquisition if we didn't get what we want
+        while actual < expected_readouts and not self._closed:
             running = True
-            i = 0
-            self._start_acquisition()
-            start = time.time()
-            while running and (actual < expected_readouts):  # grab readouts
+            received = 0  # readouts of this attempt
+            timing.times["start"] = time.time()
+            with timing.phase("start"):
+                self._start_acquisition()
+            schedule.start()
+            while running and (actual < expected_readouts) and not self._closed:  # grab readouts
+                self._poll_sensor()
                 try:
-                    # wait is blocking, so use short waits and ignore timeouts...
-                    available_data, status = self.proem._dev.WaitForAcquisitionUpdate(wait)
+                    # wait blocks the worker thread only, and returns as soon as readouts arrive
+                    with timing.phase("wait"):
+                        available_data, status = self.proem._dev.WaitForAcquisitionUpdate(
+                            schedule.wait(received)
+                        )
                 except Exception as e:
                     if e.code == self.PicamEnums.Error.TimeOutOccurred:
-                        i += 1
-                        await asyncio.sleep(0)
-                        if i > 10 and not (i % 10):
-                            # ...however, if timeouts are excessive, the acquisition broke somehow
-                            dt = time.time() - start
-                            self.logger.info(
-                                "; ".join(
-                                    [
-                                        f"acquisition running? {self.proem._dev.IsAcquisitionRunning()}",
-                                        f"dt={dt:0.2f} sec",
-                                    ]
-                                )
+                        timing.counts["timeouts"] += 1
+                        if not schedule.overdue(received):  # woke up just short of the deadline
+                            continue
+                        # the readout did not arrive in time; the acquisition broke somehow
+                        self.logger.info(
+                            "; ".join(
+                                [
+                                    f"acquisition running? {self.proem._dev.IsAcquisitionRunning()}",
+                                    f"readout {received} overdue by "
+                                    f"{time.monotonic() - schedule.expected(received):0.2f} sec",
+                                ]
                             )
-                            if dt > timeout / 1e3:
-                                self.logger.info(
-                                    "measure is taking too long; retrying measurement"
-                                )
-                                await self._stop_acquisition()
-                                self.logger.error("timeout")
-                                break
-                        else:
-                            self.logger.debug(f"waits={i}")
-                        continue
+                        )
+                        self.logger.info("measure is taking too long; retrying measurement")
+                        timing.counts["retries"] += 1
+                        with timing.phase("stop"):
+                            self._stop_acquisition()
+                        self.logger.error("timeout")
+                        break
                     else:
-                        await self._stop_acquisition()
+                        self._telemetry.add_error()
+                        self._stop_acquisition()
                         self.logger.error("", exc_info=e)
                         raise e
                 else:
                     running = status.running
+                    self._check_errors(status, timing)
                     if available_data.readout_count:
-                        readouts.extend(
-                            self.proem._extract_available_data(available_data, copy=True)
-                        )
+                        now = timing.times["end"] = time.time()
+                        with timing.phase("reduce"):
+                            for frames in self._readouts(available_data):
+                                # shot classes count from the start of this attempt, like triggers
+                                target = stats.select(received)
+                                for frame in frames:
+                                    target.update(frame)
+                                    if recording is not None:
+                                        recording.write(frame, now, stats.shot(received))
+                                actual += 1
+                                received += 1
                     self.logger.debug(
-                        f"running {bool(running)}, readouts {len(readouts)}/{expected_readouts}"
+                        f"running {bool(running)}, readouts {actual}/{expected_readouts}"
                     )
-                    start = time.time()
-                    i = 0
-                actual = len(readouts)
-            await self._stop_acquisition()
-        readouts = np.asarray(readouts)
-        self.logger.info(f"readout shape: {readouts.shape}, actual {actual}")
-        mean = readouts.mean(axis=(0, 1, 2))
-        if np.prod(readouts.shape[:3]) > 2:  # replace hot pixels with median value
-            maxes = readouts.max(axis=(0, 1, 2))
-            mean_without_max = (mean * actual - maxes) / (actual - 1)
-            hot = ((maxes - 400) / (mean_without_max - 400) > 3) & (maxes > 800)
-            # 400 subtraction helps with sensitivity; getting too close to true baseline might create divergence due to zero counts
-            # second clause is to avoid accidentally removing noise from baseline
-            self.logger.info(f"{hot.sum()} hot pixels")
-            # median = np.median(readouts, axis=(0, 1, 2))
-            mean[hot] = mean_without_max[hot]
-            self.logger.info(f"hot values: {maxes[hot]}, corrected to: {mean[hot]}")
-        return {"mean": np.rot90(mean, 1)}
-
-    async def _stop_acquisition(self):
+            with timing.phase("stop"):
+                self._stop_acquisition()
+        return actual
+
+    def _triggered(self) -> bool:
+        """whether readouts wait for external triggers"""
+        if "TriggerSource" not in self.parameters or "TriggerResponse" not in self.parameters:
+            return False
+        return (
+            self.get_trigger_source() == "External" and self.get_trigger_response() != "NoResponse"
+        )
+
+    def _stop_acquisition(self):
         try:
+            if not self.proem._dev.IsAcquisitionRunning():
+                return  # the acquisition ended on its own with its final readout
             self.proem._dev.StopAcquisition()
         except Exception as e:
             self.logger.error("error stopping acquisition", exc_info=e)
@@ -157,97 +576,504 @@ class PiProem(HasMapping, HasMeasureTrigger):
         attempts = 0
         running = True
         while running:
-            await asyncio.sleep(0)
             try:
+                # returns as soon as the camera reports it has stopped
                 _, status = self.proem._dev.WaitForAcquisitionUpdate(50)
                 running = status.running
             except Exception as e:
-                if e.code == self.PicamEnums.Error.TimeOutOccurred:
-                    attempts += 1
-                    running1 = self.proem._dev.IsAcquisitionRunning()
-                    self.logger.info(f"waiting: attempts={attempts} {not running1}")
-                    if not running1:
-                        break
+                if e.code != self.PicamEnums.Error.TimeOutOccurred:
+                    raise e
+                attempts += 1
+                running1 = self.proem._dev.IsAcquisitionRunning()
+                self.logger.info(f"waiting: attempts={attempts} {not running1}")
+                if not running1:
+                    break
+
+    def _read_only(self, param, default):
+        """value of a parameter without a property (e.g. calculated by the camera), cached"""
+        if param not in self._values:
+            parameter = self.proem.params.parameters.get(param)
+            self._values[param] = default if parameter is None else parameter.get_value()
+        return self._values[param]
 
     def _start_acquisition(self):
         try:
+            self._attach_buffer()
             self.proem._dev.StartAcquisition()
         except Exception as e:
             self.logger.error("", exc_info=True, stack_info=True)
             raise e
 
-    def _gen_spectral_mapping(self):
-        """get map corresponding to static aoi and wavelength range."""
+    def _attach_buffer(self):
+        """size the acquisition buffer for the committed readouts; PICam's own if it cannot be set"""
+        stride = self._read_only("ReadoutStride", 0)  # bytes per readout
+        if self._buffer is None or not stride:
+            return
+        try:
+            self._buffer.attach(self.proem, stride)
+        except Exception as e:
+            self.logger.warning("acquisition buffer not set; PICam allocates its own", exc_info=e)
+            self._buffer = None
+
+    def _check_errors(self, status, timing):
+        """warn of readouts the camera lost, e.g. when the acquisition buffer overran"""
+        if not status.errors:
+            return
+        if status.errors & _DATA_LOST:
+            if timing is not None:
+                timing.counts["overruns"] += 1
+            self.logger.warning(
+                "acquisition buffer overrun: readouts were lost before they were read "
+                f"(acquisition_buffer_readouts is {self._config['acquisition_buffer_readouts']})"
+            )
+        else:
+            self.logger.warning(f"acquisition errors {int(status.errors):#x}")
+
+    # --- dark frames -------------------------------------------------------------------------------
+
+    def _committed(self) -> dict:
+        """settings on the camera as of the last commit
+
+        taken once per measurement, right after its commit: values set later are pending,
+        and belong to the next measurement
+        """
+        pending, self._pending = self._pending, {}  # the getters report pending values
+        try:
+            return {
+                "roi": self.get_roi(),
+                "exposure_time": self.get_exposure_time(),
+                "adc_speed": self.get_adc_speed(),
+                "adc_quality": self.get_adc_quality(),
+                "analog_gain": self.get_analog_gain(),
+                "em_gain": self.get_em_gain(),
+                "readout_count": self.get_readout_count(),
+                "triggered": self._triggered(),
+            }
+        finally:
+            self._pending = pending
+
+    def _dark_key(self, committed: dict) -> dict:
+        """settings a dark frame depends on"""
+        key = {name: committed[name] for name in _DARK_SETTINGS}
+        key["temperature"] = round(self.get_sensor_temperature())
+        return key
+
+    # --- measurement queue -------------------------------------------------------------------------
+
+    def queue_measurements(self, measurements: list[dict]) -> list[int]:
+        """run measurements back to back, each with its own settings; returns their ids"""
+        for settings in measurements:
+            if settings.get("roi") is not None:
+                self._geometry.full._replace(**settings["roi"])  # raises on unknown fields
+        # measurements already queued, and one in progress, come first
+        first = self._measurement_id + int(self._busy) + len(self._queued) + 1
+        self._queued.extend(dict(settings) for settings in measurements)
+        if not self._busy:
+            self.measure(self._loop_requested)
+        else:
+            self._looping = True
+        return list(range(first, first + len(measurements)))
+
+    def _stage(self, settings: dict) -> dict:
+        """set the values of queued settings; they are pending until the next commit
+
+        returns the settings they replaced, which stage back the values before
+        """
+        previous = {}
+        if settings.get("roi") is not None:
+            previous["roi"] = self.get_roi()
+            self.set_roi(settings["roi"])
+        for key, getter, setter in [
+            ("exposure_time", self.get_exposure_time, self.set_exposure_time),
+            ("readout_count", self.get_readout_count, self.set_readout_count),
+            ("em_gain", self.get_em_gain, self.set_em_gain),
+        ]:
+            if settings.get(key) is not None:
+                previous[key] = getter()
+                setter(settings[key])
+        return previous
+
+    def get_queue_length(self) -> int:
+        return len(self._queued)
+
+    def get_measured_by_id(self, measurement_id: int) -> dict:
+        return self._results.get(measurement_id, {})
+
+    def get_measured_ids(self) -> list[int]:
+        return list(self._results)
+
+    def acquire_dark(self) -> int:
+        self._store_dark = True
+        return self.measure()
+
+    def get_dark_status(self) -> str:
+        return self._dark_status
+
+    def clear_darks(self):
+        self._darks.clear()
+        self._dark_status = "missing"
+
+    # --- raw frame recording -----------------------------------------------------------------------
+
+    def _start_recording(self, committed: dict, dark_key: dict):
+        if self._recorder is None:
+            directory = (
+                self._config["record_directory"]
+                or platformdirs.user_data_path("yaqd-pi", "yaq") / self.name / "recordings"
+            )
+            # measurement ids restart with the daemon, so each run gets its own directory
+            session = time.strftime("%Y%m%d-%H%M%S")
+            self._recorder = FrameRecorder(
+                pathlib.Path(directory) / session, self._config["record_buffer_count"]
+            )
+            self.logger.info(f"recording to {self._recorder.directory}")
+        if self._recorder.error is not None:
+            self.logger.error("recording failed", exc_info=self._recorder.error)
+            self._recorder.error = None
+        measurement_id = self._measurement_id + 1
+        metadata = {
+            **dark_key,
+            "temperature": self.get_sensor_temperature(),
+            "readout_count": committed["readout_count"],
+            "measurement_id": measurement_id,
+            "started": time.time(),
+            "orientation": f"camera; np.rot90(frame, {self._geometry.rotation}) is oriented like the channels",
+        }
+        if self._shot_classes:
+            metadata["shot_classes"] = self._shot_classes
+            metadata["shot_phase"] = self._shot_phase
+        recording = self._recorder.start(f"{measurement_id:06d}", metadata)
+        self._recordings[measurement_id] = str(recording.path)
+        while len(self._recordings) > 1000:
+            self._recordings.popitem(last=False)
+        return recording
+
+    def set_recording(self, recording: bool):
+        self._recording = recording
+
+    def get_recording(self) -> bool:
+        return self._recording
+
+    def get_recording_path(self, measurement_id: int) -> str:
+        return self._recordings.get(measurement_id, "")
+
+    # --- continuous acquisition --------------------------------------------------------------------
+
+    def _run_stream(self):
+        """free-running acquisition; runs on the acquisition worker thread until stopped"""
+        readout_count = self.proem.params.ReadoutCount
+        window_readouts = readout_count.get_value()
+        readout_count.set_value(0)  # PICam acquires indefinitely
+        self._commit_parameters()
+        # restore the uncommitted value so the readout_count property still reports the window
+        readout_count.set_value(window_readouts)
+        self._values["ReadoutCount"] = window_readouts
+        self._start_acquisition()
+        self._acquiring = True
+        index = 0  # readouts since the start, for shot classes
+        window, taken = None, 0  # current window, and its readouts so far
+        try:
+            while not self._stream_stop.is_set():
+                self._poll_sensor()
+                try:
+                    available_data, status = self.proem._dev.WaitForAcquisitionUpdate(50)
+                except Exception as e:
+                    if e.code == self.PicamEnums.Error.TimeOutOccurred:
+                        continue
+                    raise e
+                if not status.running:
+                    raise self.PicamError("continuous acquisition stopped unexpectedly")
+                self._check_errors(status, None if self._window is None else self._window[4])
+                if not available_data.readout_count:
+                    continue
+                now = time.time()
+                for frames in self._readouts(available_data):
+                    index += 1
+                    if self._window is None:
+                        continue
+                    if self._window is not window:
+                        window, taken = self._window, 0
+                    stats, wanted, done, recording, timing = window
+                    timing.times.setdefault("start", now)
+                    timing.times["end"] = now
+                    target = stats.select(index - 1)
+                    for frame in frames:
+                        target.update(frame)
+                        if recording is not None:
+                            recording.write(frame, now, stats.shot(index - 1))
+                    # readouts, like readout_count; each may hold several frames
+                    taken += 1
+                    if taken >= wanted:
+                        self._window = None
+                        self._loop.call_soon_threadsafe(done.set_result, taken)
+        except Exception as e:
+            self._telemetry.add_error()
+            self.logger.error("continuous acquisition failed", exc_info=e)
+            raise e
+        finally:
+            self._acquiring = False
+            # stopped or failed with a window open: it ends with the readouts it has
+            if self._window is not None:
+                done = self._window[2]
+                taken = taken if self._window is window else 0
+                self._window = None
+                self._loop.call_soon_threadsafe(done.set_result, taken)
+            self._stop_acquisition()
+            if not self._closed:  # restore the readout count
+                self._commit_parameters()
+
+    def start_continuous(self):
+        if self._stream is None:
+            self._create_task(self._start_stream())
+
+    async def _start_stream(self):
+        await self._wait_ready()
+        if self._busy:
+            await asyncio.wait_for(self._not_busy_sig.wait(), None)
+        self._begin_stream()
+
+    def _begin_stream(self):
+        if self._stream is not None:
+            return
+        self.logger.info("starting continuous acquisition")
+        self._stream_stop.clear()
+        self._frame_times.clear()
+        self._stream = asyncio.ensure_future(self._worker.run(self._run_stream))
+        self._stream.add_done_callback(self._stream_done)
+
+    def _stream_done(self, stream):
+        if self._stream is stream:
+            self._stream = None
+        if self._stream is None and self._window is not None:  # opened after the last readout
+            done = self._window[2]
+            self._window = None
+            done.set_result(0)
+
+    def stop_continuous(self):
+        self._create_task(self._stop_stream())
+
+    async def _stop_stream(self):
+        stream = self._stream
+        if stream is None:
+            return
+        self.logger.info("stopping continuous acquisition")
+        self._stream_stop.set()
+        self._stream = None
+        try:
+            await stream
+        except Exception:
+            pass  # already logged on the worker
+
+    def get_continuous(self) -> bool:
+        return self._stream is not None
+
+    def get_latest_frame(self):
+        if not self._latest.frames.size:
+            return np.zeros((0, 0))
+        return self._geometry.orient(self._latest.frames[0])
+
+    def get_preview(self):
+        return self._preview.image
+
+    def get_preview_stats(self) -> dict[str, float]:
+        return self._preview.stats
+
+    def get_shot_classes(self) -> list[str]:
+        return self._shot_classes
+
+    def set_shot_phase(self, phase: int):
+        self._shot_phase = phase
+
+    def get_shot_phase(self) -> int:
+        return self._shot_phase
+
+    def get_sync_group(self) -> str:
+        return self._config["sync_group"] or ""
+
+    def get_frames_per_second(self) -> float:
+        blocks = list(self._frame_times)
+        if len(blocks) < 2 or blocks[-1][0] == blocks[0][0]:
+            return 0.0
+        # readouts of the first block arrived before the interval began
+        return sum(n for _, n in blocks[1:]) / (blocks[-1][0] - blocks[0][0])
+
+    def _gen_spectral_mapping(self, roi: ROI_UI | None = None):
+        """wavelengths (nm) of roi (default current), shaped to broadcast against the channels"""
         spec = self._config["spectrometer"]
-        mm_per_pixel = self.proem.params.PixelHeight.get_value() / 1e3
-        self.logger.info(spec)
-        self.logger.error("Spectral mapping is not yet implemented")
-        raise NotImplementedError
+        if roi is None:
+            roi = ROI_UI(**self.get_roi())
+        if spec["axis"] == 1:
+            start, pixels, binning = roi.left, roi.width, roi.x_binning
+        else:  # rows run from bottom - height, like y_index
+            start, pixels, binning = roi.bottom - roi.height, roi.height, roi.y_binning
+        out = wavelengths(
+            spec["gpmm"],
+            spec["grating_aoi_deg"],
+            spec["focal_length"],
+            spec["position_offset"],
+            spec["order"],
+            self.proem.params.PixelHeight.get_value() / 1e3,  # mm per pixel
+            start,
+            pixels,
+            binning,
+        )
+        return out[None, :] if spec["axis"] == 1 else out[:, None]
 
     # --- properties ------------------------------------------------------------------------------
 
     def set_roi(self, _roi: dict[str, int]):
-        roi = ROI_UI(**_roi)
+        roi = self._geometry.full._replace(**_roi)
+        if self._camera_serial is not None:  # else set on the camera at the end of startup
+            # the camera only sees the roi at the next commit, like other parameters
+            self._pending["Rois"] = (self._set_camera_roi, roi)
+        self._roi = roi
+        self._update_roi(roi)
+
+    def _set_camera_roi(self, roi: ROI_UI):
         try:
-            self.proem.set_roi(**ui_to_native(roi)._asdict())
+            self.proem.set_roi(**self._geometry.to_native(roi)._asdict())
         except Exception as e:
             self.logger.error(f"roi: {roi}", exc_info=e)
             raise e
-        new = ROI_UI(**self.get_roi())
-
-        self._mappings["y_index"] = np.arange(
-            new.bottom - (new.height // new.y_binning),
-            new.bottom,
-            dtype="i2",
-        )[:, None]
-        self._mappings["x_index"] = np.arange(
-            new.left,
-            new.left + (new.width // new.x_binning),
-            dtype="i2",
-        )[None, :]
 
+    def _update_roi(self, new: ROI_UI):
+        """mappings, channel shapes, and buffers of the roi; computed once per roi change"""
         # channel indexing is (y_index, x_index)
+        self._mappings["y_index"], self._mappings["x_index"] = self._geometry.indices(new)
         # ignore 2D shape types until https://github.com/yaq-project/yaq-python/pull/82 is implemented
-        self._channel_shapes = {
-            "mean": (
-                new.height // new.y_binning,
-                new.width // new.x_binning,
-            ),  # type: ignore
-        }
+        shape = self._geometry.shape(new)
+        self._channel_shapes = {name: () for name in self._base_channels}
+        for name in self._image_channels:
+            self._channel_shapes[name] = shape  # type: ignore
+        if self._config["spectrometer"] is not None and self._camera_serial is not None:
+            self._mappings["wavelengths"] = self._gen_spectral_mapping()
+        self._update_sub_channels(new)
+
+    def _update_sub_channels(self, roi: ROI_UI):
+        """channels and mappings of the sub-regions that fit the camera roi"""
+        for name in self._sub_slices:
+            for key in ["y_index", "x_index", "wavelengths"]:
+                self._mappings.pop(f"{name}_{key}", None)
+            self._channel_units.pop(name, None)
+            self._channel_mappings.pop(name, None)
+        self._sub_slices = {}
+        self._channel_names = list(self._base_channels)
+        self._channel_shapes = {k: self._channel_shapes[k] for k in self._channel_names}
+        spec = self._config["spectrometer"]
+        for sub in self._sub_rois:
+            try:
+                self._sub_slices[sub.name] = sub_roi_slices(sub, roi)
+            except ValueError as e:
+                self.logger.error(f"sub roi {sub.name} disabled: {e}")
+                continue
+            y_binning = roi.y_binning * sub.y_binning
+            x_binning = roi.x_binning * sub.x_binning
+            binned = ROI_UI(sub.bottom, sub.left, sub.width, sub.height, y_binning, x_binning)
+            # the same coordinates as the camera roi channel
+            y_index, x_index = self._geometry.indices(binned)
+            mappings = {"y_index": y_index, "x_index": x_index}
+            if spec is not None and self._camera_serial is not None:  # pixel size from the camera
+                mappings["wavelengths"] = self._gen_spectral_mapping(binned)
+            if sub.full_binning == "vertical":  # 1D along x
+                mappings = {k: v[0] for k, v in mappings.items() if v.shape[0] == 1}
+            elif sub.full_binning == "horizontal":  # 1D along y
+                mappings = {k: v[:, 0] for k, v in mappings.items() if v.shape[1] == 1}
+            for key, mapping in mappings.items():
+                self._mappings[f"{sub.name}_{key}"] = mapping
+            self._channel_names.append(sub.name)
+            self._channel_units[sub.name] = "counts"
+            self._channel_mappings[sub.name] = [f"{sub.name}_{k}" for k in mappings]
+            shape: tuple[int, ...] = self._geometry.shape(binned)
+            if sub.full_binning == "vertical":
+                shape = shape[1:]
+            elif sub.full_binning == "horizontal":
+                shape = shape[:1]
+            self._channel_shapes[sub.name] = shape  # type: ignore
+        if self._config["transport"].startswith("uint"):  # array = codes * scale + offset
+            for name in [n for n in self._channel_names if self._channel_shapes[n]]:
+                for suffix in ["scale", "offset"]:
+                    self._channel_names.append(f"{name}_{suffix}")
+                    self._channel_shapes[f"{name}_{suffix}"] = ()
+                    self._channel_units[f"{name}_{suffix}"] = self._channel_units[name]
+
+    def set_sub_rois(self, sub_rois: list[dict]):
+        subs = [SubROI(**sub) for sub in sub_rois]
+        roi = ROI_UI(**self.get_roi())
+        names = [sub.name for sub in subs]
+        for sub in subs:
+            if sub.name in self._base_channels or names.count(sub.name) > 1:
+                raise ValueError(f"sub roi name {sub.name} is not unique")
+            sub_roi_slices(sub, roi)  # raises if it does not fit
+        self._sub_rois = subs
+        self._update_sub_channels(roi)
+
+    def get_sub_rois(self) -> list[dict]:
+        return [sub._asdict() for sub in self._sub_rois]
 
     def get_roi(self) -> dict:
-        _roi = self.proem.params.Rois.get_value()[0]
-        roi = ROI_native(*[getattr(_roi, k) for k in ROI_native._fields])
-        return native_to_ui(roi)._asdict()
+        if self._camera_serial is None or "Rois" in self._pending:
+            return self._roi._asdict()
+        if "Rois" not in self._values:
+            _roi = self.proem.params.Rois.get_value()[0]
+            roi = ROI_native(*[getattr(_roi, k) for k in ROI_native._fields])
+            self._values["Rois"] = self._geometry.to_ui(roi)._asdict()
+        return dict(self._values["Rois"])  # type: ignore
 
     def gen_param(self, param):
-        """dynamic setter, getter creation for parameters"""
-        my_param = self.proem.params.parameters[param]
+        """dynamic setter, getter creation for parameters
 
-        if param in self.enum_keys:
-            param_enums = list(
-                filter(lambda x: my_param.can_set(x), getattr(self.PicamEnums, param))
-            )
-            _set = lambda val: my_param.set_value([i for i in param_enums if i.name == val][0])
-            _get = lambda _: my_param.get_value().name
-            parameter_type = lambda: [i.name for i in param_enums]
-        else:
-            _set = lambda val: my_param.set_value(val)
-            _get = lambda _: my_param.get_value()
-            parameter_type = None
+        the SDK parameter (and whether it is an enum) is looked up on use, once the camera is open
+        """
+
+        def param_enums():
+            # settable options can depend on other parameters, so they are cached per commit
+            self._require_ready()
+            if param not in self._options:
+                members = getattr(self.PicamEnums, param)
+                my_param = self.proem.params.parameters[param]
+                self._options[param] = [i for i in members if my_param.can_set(i)]
+            return self._options[param]
+
+        def _set(val):
+            if param in self.enum_keys:
+                options = [i for i in param_enums() if i.name == val]
+                if not options:
+                    raise ValueError(f"{val} is not a valid {param}")
+                val = options[0]
+            parameter = self.proem.params.parameters[param]
+            if not parameter.can_set(val):
+                raise ValueError(f"{val} is not a valid {param}")
+            parameter.set_value(val)
+
+        def _get(_):
+            value = self.proem.params.parameters[param].get_value()
+            return value.name if param in self.enum_keys else value
+
+        parameter_type = lambda: [i.name for i in param_enums()]
 
         # wrap functions with error reporting
         def get_parameter():
+            if param in self._pending:
+                return self._pending[param][1]
+            if param in self._values:
+                return self._values[param]
+            self._require_ready()
             try:
                 value = _get(None)
             except Exception as e:
                 self.logger.error(f"get {param}")
                 self.logger.error(e, exc_info=True)
                 raise e
+            self._values[param] = value
             return value
 
         def set_parameter(val):
-            self._create_task(self._set_when_ready(_set, param, val))
+            # enum values are checked now if the camera is ready, else at the commit;
+            # the SDK only sees the value at the next commit
+            if param in self.enum_keys and val not in parameter_type():
+                self.logger.error(f"set {param} {val}: options are {parameter_type()}")
+                raise ValueError(f"{val} is not a valid {param}")
+            self._pending[param] = (_set, val)
 
         return set_parameter, get_parameter, parameter_type
 
@@ -256,17 +1082,77 @@ class PiProem(HasMapping, HasMeasureTrigger):
         self._background.add(task)
         task.add_done_callback(self._background.discard)
 
-    async def _set_when_ready(self, func, param, val):
-        if self._busy:
-            await asyncio.wait_for(self._not_busy_sig.wait(), None)
+    # --- parameter commits -------------------------------------------------------------------------
+
+    def _commit_parameters(self):
+        """commit parameters to the camera, with instrumentation; blocking"""
+        start = time.perf_counter()
+        self.proem.commit_parameters()
+        self._values.clear()
+        self._options.clear()
+        dt = time.perf_counter() - start
+        self._commit_count += 1
+        self._commit_time += dt
+        self.logger.debug(f"commit {self._commit_count} took {dt * 1e3:0.1f} ms")
+
+    def _commit_pending(self, pending: dict):
+        """set pending values and commit them all at once; blocking
+
+        values the camera rejects are dropped; if the commit fails, every value set is reverted
+        """
+        parameters = self.proem.params.parameters
+        previous = {param: parameters[param].get_value() for param in pending}
+        for param, (func, val) in pending.items():
+            try:
+                func(val)
+            except Exception as e:
+                self.logger.error(f"set {param} {val}: dropped", exc_info=e)
+                previous.pop(param)
         try:
-            func(val)
-            self.proem.commit_parameters()
-            self.logger.info("parameters updated")
+            self._commit_parameters()
         except Exception as e:
-            self.logger.error(f"set {param} {val}")
-            self.logger.error(e, exc_info=True, stack_info=True)
+            self.logger.error(f"commit failed; reverted {list(previous)}", exc_info=e)
+            for param, value in previous.items():
+                parameters[param].set_value(value)
             raise e
+        self.logger.info(f"parameters updated: {list(previous)}")
+
+    async def _apply_pending(self):
+        """apply all pending parameter values in a single commit, if there are any"""
+        if not self._pending:
+            return
+        # the camera cannot take new parameters while free-running
+        streaming = self._stream is not None
+        if streaming:
+            await self._stop_stream()
+        pending, self._pending = self._pending, {}
+        for param in pending:
+            self._values.pop(param, None)
+        try:
+            await self._worker.run(self._commit_pending, pending)
+        finally:
+            if "Rois" in pending and "Rois" not in self._pending:
+                roi = ROI_UI(**self.get_roi())  # as the camera took it, or kept it
+                if roi != self._roi:
+                    self._roi = roi
+                    self._update_roi(roi)
+            if streaming:
+                self._begin_stream()
+
+    def apply_parameters(self):
+        self._create_task(self._apply_when_ready())
+
+    async def _apply_when_ready(self):
+        await self._wait_ready()
+        if self._busy:
+            await asyncio.wait_for(self._not_busy_sig.wait(), None)
+        await self._apply_pending()
+
+    def get_acquisition_stats(self) -> dict[str, dict[str, float]]:
+        return self._timing.summary()
+
+    def get_commit_stats(self) -> dict[str, float]:
+        return {"count": float(self._commit_count), "seconds": self._commit_time}
 
     def get_parameters(self) -> list[str]:
         return self.parameters
@@ -277,55 +1163,122 @@ class PiProem(HasMapping, HasMeasureTrigger):
         # and is a plot hint to communicate what mapping to use
         # future plan is to remove the automatic mapping and retain old ROI
         # DDK 2025-06-10
+        self._require_ready()
         roi = ROI_UI(**self.get_roi())
         if mode == "spatial":
-            self._mappings["x_index"] = (
-                np.arange(0, roi.width // roi.x_binning, dtype="i2")[None, :] + roi.left
-            )
-            self._mappings["wavelengths"] = self._gen_spectral_mapping()[None, :]
-
+            self._update_roi(roi)
             self._state["spectrometer_mode"] = mode
         if mode == "spectral":
             if roi.x_binning == 1:
                 self.logger.error("need x_binning ==1")
                 raise ValueError
-            self.proem.set_roi(y=0, height=512)  # sets roi on the camera level, not daemon level
-            roi = ROI_UI(**self.get_roi())
-
-            self._mappings["x_index"] = (
-                np.arange(
-                    0,
-                    roi.width // roi.x_binning,
-                    dtype="i2",
-                )[None, :]
-                + roi.left
-            )
-            self._mappings["wavelengths"] = self._gen_spectral_mapping()[None, :]
+            # the full sensor along the spectral axis (camera y)
+            self.set_roi(roi._replace(left=0, width=self._geometry.sensor_height)._asdict())
             self._state["spectrometer_mode"] = mode
 
     def get_spectrometer_mode(self):
         return self._state["spectrometer_mode"]
 
-    def _set_temperature(self):
-        self.proem.params.SensorTemperatureSetPoint.set_value(
-            self._config["sensor_temperature_setpoint"]
+    # --- telemetry ---------------------------------------------------------------------------------
+
+    async def _run_telemetry(self):
+        unlocked_warning = -np.inf  # time.monotonic of the last warning
+        while not self._closed:
+            await asyncio.sleep(self._config["temperature_refresh_interval"])
+            try:
+                # while acquiring, the acquisition loop reads the sensor; the stream holds the
+                # worker from before its commit, so a read queued then would wait until it stops
+                if not (self._acquiring or self._stream is not None):
+                    await self._worker.run(self._read_sensor)
+                self._sample_telemetry()
+            except Exception as e:
+                self.logger.error("telemetry sample failed", exc_info=e)
+                continue
+            if self._locked.is_set():
+                unlocked_warning = -np.inf
+            elif time.monotonic() - unlocked_warning > 5:
+                unlocked_warning = time.monotonic()
+                self.logger.warning(
+                    f"Temperature {self._temperature_status}. "
+                    f"Target: {self._config['sensor_temperature_setpoint']} C. "
+                    f"Current: {self.get_sensor_temperature()} C."
+                )
+
+    def _read_sensor(self):
+        """read the sensor temperature and status from the camera; runs on the worker thread
+
+        stored parameter values (get_value) only refresh on a commit, so these are read live
+        """
+        dev, params = self.proem._dev, self.proem.params
+        reading, status = params.SensorTemperatureReading, params.SensorTemperatureStatus
+        if dev.CanReadParameter(reading._param):
+            temperature = dev.ReadParameterFloatingPointValue(reading._param)
+        else:
+            temperature = reading.get_value()
+        if dev.CanReadParameter(status._param):
+            code = dev.ReadParameterIntegerValue(status._param)
+            status_name = self.PicamEnums.SensorTemperatureStatus(code).name
+        else:
+            status_name = status.get_value().name
+        self._sensor = (float(temperature), status_name, time.monotonic())
+
+    def _poll_sensor(self):
+        """read the sensor, if a sample is due; for acquisition loops, which hold the worker"""
+        if time.monotonic() - self._sensor[2] < self._config["temperature_refresh_interval"]:
+            return
+        try:
+            self._read_sensor()
+        except Exception as e:
+            # not again until the next interval
+            temperature, status, _ = self._sensor
+            self._sensor = (temperature, status, time.monotonic())
+            self.logger.error("sensor read failed", exc_info=e)
+
+    def _sample_telemetry(self):
+        """add a telemetry sample, with the latest sensor reading"""
+        temperature, status, _ = self._sensor
+        if status != self._temperature_status:
+            if status == "Locked":
+                self.logger.info("Temp stabilized.")
+            self._temperature_status = status
+        if status == "Locked":
+            self._locked.set()
+        else:
+            self._locked.clear()
+        self._telemetry.sample(
+            temperature=temperature,
+            locked=float(status == "Locked"),
+            busy=float(self._busy),
+            continuous=float(self._stream is not None),
+            frames_per_second=self.get_frames_per_second(),
         )
-        self._create_task(self._check_temp_stabilized())
-
-    async def _check_temp_stabilized(self):
-        # DDK: so far, I can only get these values to refresh when I actually commit parameters
-        # (i.e. I cannot just call the following function; the parameters have to be different)
-        self.proem.commit_parameters()  # I think this updates the temperatures as well?
-        set_temp = self.proem.params.SensorTemperatureSetPoint.get_value()
-        while (status := self.proem.params.SensorTemperatureStatus.get_value().name) != "Locked":
-            self.logger.warning(
-                f"Temperature {status}. Target: {set_temp} C. Current: {self.get_sensor_temperature()} C."
-            )
-            await asyncio.sleep(5)
-        self.logger.info("Temp stabilized.")
+
+    async def _wait_for_lock(self, timing):
+        """wait up to lock_timeout for the sensor temperature to lock"""
+        timeout = self._config["lock_timeout"]
+        if timeout <= 0 or self._locked.is_set():
+            return
+        with timing.phase("lock"):
+            try:
+                await asyncio.wait_for(self._locked.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning(
+                    f"temperature not locked ({self._temperature_status}) after {timeout} s; "
+                    "acquiring anyway"
+                )
 
     def get_sensor_temperature(self):
-        return self.proem.params.SensorTemperatureReading.get_value()
+        # nan until the camera is open
+        return self._telemetry.latest.get("temperature", float("nan"))
+
+    def get_temperature_status(self) -> str:
+        return self._temperature_status
+
+    def get_telemetry(self) -> dict[str, float]:
+        return self._telemetry.latest
+
+    def get_telemetry_history(self) -> dict[str, np.ndarray]:
+        return self._telemetry.history()
 
     def get_exposure_time_units(self):
         return "ms"
@@ -337,7 +1290,25 @@ class PiProem(HasMapping, HasMeasureTrigger):
         return [1, 100]
 
     def close(self):
-        self.proem.close()
+        self._closed = True  # acquisitions end at their next readout, the stream at its next wait
+        self._stream_stop.set()
+        # the camera closes once the acquisition thread is done with it
+        try:
+            self._worker.close(self._close_camera)
+        except Exception as e:
+            self.logger.error("error closing camera", exc_info=e)
+        if self._pool is not None:
+            self._pool.close()
+        if self._recorder is not None:
+            self._recorder.close()
+        if self._group is not None:
+            self._group.leave(self.name)
+
+    def _close_camera(self):
+        if self._camera_serial is not None:
+            self.proem.close()
+            release_camera(self._camera_serial)
+            self._camera_serial = None
 
 
 if __name__ == "__main__":
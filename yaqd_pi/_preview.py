@@ -0,0 +1,82 @@
+"""
+low-rate, decimated copy of the latest frame, for alignment and monitoring
+fed from whatever acquisition is running; reading it never triggers a measurement
+"""
+
+__all__ = ["Preview"]
+
+import time
+
+import numpy as np
+
+from ._transport import FrozenArray, freeze
+
+
+def decimate(image: np.ndarray, size: int) -> np.ndarray:
+    """block means of image, at most size x size; edge blocks may be smaller"""
+    out = image
+    for axis, length in enumerate(image.shape):
+        step = -(-length // size)  # ceil
+        if step > 1:
+            starts = np.arange(0, length, step)
+            counts = np.diff(np.append(starts, length))
+            out = np.add.reduceat(out, starts, axis=axis, dtype=np.float64)
+            out /= np.expand_dims(counts, 1 - axis)
+    return out
+
+
+class Preview:
+    """decimated latest frame and its statistics, updated at most every interval
+
+    update is called by the acquisition worker; readers on the event loop get the last published
+    (image, stats) pair, which is replaced whole and never modified
+    min and max are of the full frame (e.g. to spot saturation); percentiles are of the preview
+    """
+
+    def __init__(self, size: int, interval: float):
+        """interval in s; inf disables the preview"""
+        self.size = max(int(size), 1)
+        self.interval = interval
+        self.count = 0
+        self._time = -np.inf  # time.monotonic of the last update
+        self._published: tuple[FrozenArray, dict[str, float]] = (
+            freeze(np.zeros((0, 0)), "f4"),
+            {},
+        )
+
+    def due(self) -> bool:
+        return time.monotonic() - self._time >= self.interval
+
+    def update(self, frame: np.ndarray):
+        """frame oriented like the channels; copied, so views into SDK buffers are fine"""
+        if not self.due():
+            return
+        self._time = time.monotonic()
+        image = decimate(frame, self.size)
+        p01, p50, p99 = np.percentile(image, [1, 50, 99])
+        self.count += 1
+        stats = {
+            "min": float(frame.min()),
+            "max": float(frame.max()),
+            "mean": float(image.mean()),
+            "p01": float(p01),
+            "p50": float(p50),
+            "p99": float(p99),
+            "y_decimation": float(-(-frame.shape[0] // self.size)),
+            "x_decimation": float(-(-frame.shape[1] // self.size)),
+            "id": float(self.count),
+            "time": self._time,
+        }
+        self._published = (freeze(image, "f4"), stats)
+
+    @property
+    def image(self) -> FrozenArray:
+        return self._published[0]
+
+    @property
+    def stats(self) -> dict[str, float]:
+        """statistics of the published image, with its age (s)"""
+        stats = dict(self._published[1])
+        if stats:
+            stats["age"] = time.monotonic() - stats.pop("time")
+        return stats
@@ -0,0 +1,129 @@
+"""
+recording of raw frames to disk, off the acquisition path
+frames are copied into a ring on the acquisition thread; a writer thread appends them to .npy files
+files can be opened with np.load(path, mmap_mode="r") once a recording is closed
+"""
+
+__all__ = ["FrameRecorder", "Recording"]
+
+import json
+import pathlib
+import queue
+import threading
+import time
+from typing import BinaryIO
+
+import numpy as np
+
+from ._ring import FrameRing
+
+_HEADER_SIZE = 128  # bytes; fixed, so the frame count can be rewritten when a recording closes
+
+
+def _npy_header(dtype: np.dtype, shape: tuple[int, ...]) -> bytes:
+    """.npy (version 1.0) header padded to _HEADER_SIZE"""
+    text = f"{{'descr': '{dtype.str}', 'fortran_order': False, 'shape': {shape}, }}"
+    preamble = b"\x93NUMPY\x01\x00" + (_HEADER_SIZE - 10).to_bytes(2, "little")
+    return preamble + text.ljust(_HEADER_SIZE - 11).encode("latin1") + b"\n"
+
+
+class Recording:
+    """frames of one measurement; write from the acquisition thread, then close"""
+
+    def __init__(self, recorder: "FrameRecorder", path: pathlib.Path, metadata: dict):
+        self.recorder = recorder
+        self.path = path
+        self.metadata = metadata
+        self.count = 0  # frames written
+        self.dropped = 0  # frames lost because the writer fell behind
+        self.timestamps: list[float] = []
+        self.shots: list[str] = []  # shot class of each frame, when readouts are demultiplexed
+        self._file: BinaryIO | None = None
+
+    def write(self, frame: np.ndarray, timestamp: float, shot: str | None = None):
+        """copy frame into the ring and queue it for the writer; never blocks"""
+        if not self.recorder._slots.acquire(blocking=False):
+            self.dropped += 1
+            return
+        slot = self.recorder._ring.push(frame)
+        self.recorder._queue.put((self, slot, timestamp, shot))
+
+    def close(self):
+        self.recorder._queue.put((self, None, None, None))
+
+    # --- writer thread ---
+
+    def _append(self, slot: np.ndarray, timestamp: float, shot: str | None):
+        if self._file is None:
+            self._shape = slot.shape
+            self._dtype = slot.dtype
+            self._file = open(self.path, "wb")
+            self._file.write(_npy_header(self._dtype, (0, *self._shape)))
+        self._file.write(slot.data)
+        self.count += 1
+        self.timestamps.append(timestamp)
+        if shot is not None:
+            self.shots.append(shot)
+
+    def _finish(self):
+        if self._file is None:  # no frames; still leave a valid, empty file
+            self._shape, self._dtype = (0, 0), np.dtype("u2")
+            self._file = open(self.path, "wb")
+        self._file.seek(0)
+        self._file.write(_npy_header(self._dtype, (self.count, *self._shape)))
+        self._file.close()
+        info = dict(self.metadata, frames=self.count, dropped=self.dropped)
+        info["timestamps"] = self.timestamps
+        if self.shots:
+            info["shots"] = self.shots
+        with open(self.path.with_suffix(".json"), "w") as f:
+            json.dump(info, f)
+
+
+class FrameRecorder:
+    def __init__(self, directory: pathlib.Path, buffer_count: int):
+        """
+        buffer_count frames may wait for the writer before new frames are dropped
+        """
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._ring = FrameRing(buffer_count)
+        self._slots = threading.Semaphore(self._ring.size)
+        self._queue: queue.Queue = queue.Queue()
+        self.bytes_written = 0
+        self.write_time = 0.0  # s spent writing
+        self.error: Exception | None = None  # most recent write failure
+        self._thread = threading.Thread(target=self._run, name="frame-recorder", daemon=True)
+        self._thread.start()
+
+    def start(self, name: str, metadata: dict) -> Recording:
+        return Recording(self, self.directory / f"{name}.npy", metadata)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            recording, slot, timestamp, shot = item
+            start = time.perf_counter()
+            try:
+                if slot is None:
+                    recording._finish()
+                else:
+                    recording._append(slot, timestamp, shot)
+                    self.bytes_written += slot.nbytes
+            except Exception as e:  # keep writing later recordings; the daemon reports this
+                self.error = e
+            finally:
+                if slot is not None:
+                    self._slots.release()
+                self.write_time += time.perf_counter() - start
+                self._queue.task_done()
+
+    def flush(self):
+        """block until every queued frame is written"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
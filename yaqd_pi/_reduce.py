@@ -0,0 +1,377 @@
+"""
+streaming reduction of readouts
+frames are folded into running buffers as they arrive, so memory does not grow with readout_count
+"""
+
+__all__ = [
+    "RunningStats",
+    "ShotStats",
+    "MaxDrop",
+    "SigmaClip",
+    "TemporalMedian",
+    "rejection_stage",
+    "new_stats",
+    "bin_image",
+]
+
+import numpy as np
+
+
+class RunningStats:
+    """running sum, max, and count of frames; optionally also a running variance
+
+    buffers are allocated on the first frame and reused for the rest of the measurement
+    an optional rejection stage sees every frame and corrects the mean (and variance) at the end
+    the variance is accumulated with Welford updates, which stay accurate for large counts
+    """
+
+    def __init__(self, rejection=None, variance=False):
+        self.count = 0
+        self.sum: np.ndarray | None = None
+        self.max: np.ndarray | None = None
+        self.rejection = rejection
+        self.variance = variance
+        self.m: np.ndarray | None = None  # running mean
+        self.m2: np.ndarray | None = None  # running sum of squared deviations from the mean
+        self._scratch: tuple[np.ndarray, np.ndarray] | None = None
+
+    def update(self, frame: np.ndarray):
+        if self.sum is None or self.max is None:
+            self.sum = np.zeros(frame.shape, dtype="f8")
+            self.max = np.zeros(frame.shape, dtype=frame.dtype)
+            if self.variance:
+                self.m = np.zeros(frame.shape, dtype="f8")
+                self.m2 = np.zeros(frame.shape, dtype="f8")
+                self._scratch = (np.empty(frame.shape), np.empty(frame.shape))
+        np.add(self.sum, frame, out=self.sum)
+        np.maximum(self.max, frame, out=self.max)
+        self.count += 1
+        if self.m is not None and self.m2 is not None and self._scratch is not None:
+            delta, step = self._scratch
+            np.subtract(frame, self.m, out=delta)
+            np.multiply(delta, 1 / self.count, out=step)
+            self.m += step
+            np.subtract(frame, self.m, out=step)
+            delta *= step
+            self.m2 += delta
+        if self.rejection is not None:
+            self.rejection.update(frame)
+
+    def select(self, readout: int) -> "RunningStats":
+        """stats that readout (counted from the start of the acquisition) is folded into"""
+        return self
+
+    def shot(self, readout: int) -> str | None:
+        return None
+
+    def mean(self) -> np.ndarray:
+        """the mean, computed in place: the sum is consumed"""
+        if self.sum is None:
+            raise ValueError("no frames")
+        return np.divide(self.sum, self.count, out=self.sum)
+
+    def mean_without_max(self, mean: np.ndarray) -> np.ndarray:
+        """mean of each pixel with its brightest frame removed"""
+        return (mean * self.count - self.max) / (self.count - 1)
+
+    def result(self) -> tuple[np.ndarray, np.ndarray]:
+        """mean, and a mask of pixels the rejection stage corrected"""
+        mean = self.mean()
+        if self.rejection is None:
+            return mean, np.zeros(mean.shape, dtype=bool)
+        return mean, self.rejection.apply(self, mean)
+
+    def spread(self, hot: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """sample variance of each pixel and the number of values it is over
+
+        values the rejection stage removed (pixels in hot) are left out, as they are of the mean
+        NaN where fewer than two values remain
+        """
+        if self.m2 is None:
+            raise ValueError("variance was not accumulated")
+        variance = np.empty(self.m2.shape)
+        np.divide(self.m2, self.count - 1, out=variance)
+        count = np.full(self.m2.shape, self.count, dtype="f8")
+        if self.rejection is not None and hot.any():
+            self.rejection.correct_spread(self, hot, variance, count)
+        variance[count < 2] = np.nan
+        return variance, count
+
+
+class ShotStats:
+    """running stats of readouts demultiplexed into shot classes (e.g. pump on and off)
+
+    readout n, counted from the start of an acquisition, belongs to classes[(n + phase) % len(classes)]
+    each class has its own RunningStats, with its own rejection; the combined result covers
+    every readout, so ShotStats stands in for a RunningStats
+    """
+
+    def __init__(self, classes: list[str], make_stats, phase: int = 0):
+        self.classes = list(classes)
+        self.phase = phase
+        self.shots = {name: make_stats() for name in self.classes}
+        self.means: dict[str, np.ndarray] = {}  # per class, after result
+        self._hots: dict[str, np.ndarray] = {}
+
+    def shot(self, readout: int) -> str:
+        return self.classes[(readout + self.phase) % len(self.classes)]
+
+    def select(self, readout: int) -> RunningStats:
+        return self.shots[self.shot(readout)]
+
+    @property
+    def count(self) -> int:
+        return sum(stats.count for stats in self.shots.values())
+
+    @property
+    def max(self) -> np.ndarray:
+        return np.maximum.reduce([s.max for s in self.shots.values() if s.max is not None])
+
+    def result(self) -> tuple[np.ndarray, np.ndarray]:
+        """mean over all readouts, and the pixels rejection corrected in any class
+
+        the mean of each class is kept in means; NaN for a class without readouts
+        """
+        filled = {name: stats for name, stats in self.shots.items() if stats.count}
+        if not filled:
+            raise ValueError("no frames")
+        for name, stats in filled.items():
+            self.means[name], self._hots[name] = stats.result()
+        mean = self._combined()
+        hot = np.logical_or.reduce(list(self._hots.values()))
+        for name in self.classes:
+            self.means.setdefault(name, np.full(mean.shape, np.nan))
+        return mean, hot
+
+    def spread(self, hot: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """variance over all readouts, merged from the classes (Chan et al.)
+
+        hot is ignored: each class leaves out what its own rejection removed
+        """
+        mean = self._combined()
+        m2 = np.zeros(mean.shape)
+        count = np.zeros(mean.shape)
+        for name, stats in self.shots.items():
+            if not stats.count:
+                continue
+            variance, n = stats.spread(self._hots[name])
+            m2 += np.nan_to_num(variance * (n - 1))  # zero where a class has one value
+            m2 += n * (self.means[name] - mean) ** 2
+            count += n
+        with np.errstate(all="ignore"):
+            variance = m2 / (count - 1)
+        variance[count < 2] = np.nan
+        return variance, count
+
+    def _combined(self) -> np.ndarray:
+        """mean over all readouts, from the class means"""
+        mean = np.zeros(next(iter(self.means.values())).shape)
+        for name, stats in self.shots.items():
+            if stats.count:
+                mean += self.means[name] * (stats.count / self.count)
+        return mean
+
+
+# --- rejection stages ----------------------------------------------------------------------------
+# each stage folds frames in with update, then corrects the mean in place with apply
+
+
+class MaxDrop:
+    """drop the brightest frame of pixels whose max stands out from the rest
+
+    handles at most one hot frame per pixel
+    """
+
+    def __init__(self, offset=400.0, ratio=3.0, floor=800.0, **kwargs):
+        self.offset = offset
+        self.ratio = ratio
+        self.floor = floor
+
+    def update(self, frame):
+        pass
+
+    def apply(self, stats, mean) -> np.ndarray:
+        if stats.count <= 2:
+            return np.zeros(mean.shape, dtype=bool)
+        mean_without_max = stats.mean_without_max(mean)
+        # offset subtraction helps with sensitivity; getting too close to true baseline might create divergence due to zero counts
+        # floor is to avoid accidentally removing noise from baseline
+        hot = ((stats.max - self.offset) / (mean_without_max - self.offset) > self.ratio) & (
+            stats.max > self.floor
+        )
+        mean[hot] = mean_without_max[hot]
+        return hot
+
+    def correct_spread(self, stats, hot, variance, count):
+        """remove the max of hot pixels from their variance (a reversed Welford update)"""
+        n = stats.count
+        x = stats.max[hot].astype("f8")
+        m = stats.m[hot]
+        m_without = (n * m - x) / (n - 1)
+        m2_without = stats.m2[hot] - (x - m_without) * (x - m)
+        with np.errstate(all="ignore"):
+            variance[hot] = np.maximum(m2_without, 0) / (n - 2)
+        count[hot] = n - 1
+
+
+class SigmaClip:
+    """exclude values more than sigma standard deviations above the mean of that pixel
+
+    clipping is one-sided: hot pixels and cosmic rays only ever add counts
+    the first min_readouts frames are held to seed the estimate: a (median, MAD) screen drops hits,
+    then the mean and variance of the remaining seed values start the clipping,
+    so memory is bounded by min_readouts rather than readout_count
+    after that, the mean is built from accepted values only, so repeated hits on a pixel are all rejected,
+    while the variance is built from every value, with clipped values counted at the threshold
+    (a variance of accepted values only shrinks under truncation and clips ever more clean values)
+    the threshold widens while few values are in, as the estimate of the variance is itself noisy
+    """
+
+    def __init__(self, sigma=5.0, min_readouts=16, **kwargs):
+        self.sigma = sigma
+        self.min_readouts = max(min_readouts, 1)
+        self.seed: list[np.ndarray] = []
+        self.n: np.ndarray | None = None  # accepted values per pixel
+
+    def update(self, frame):
+        if self.n is None:
+            self.seed.append(frame.copy())
+            if len(self.seed) >= self.min_readouts:
+                self._flush()
+            return
+        variance = self.w_m2 / max(self.w_n - 1, 1)
+        self._fold(frame, self.mean, variance, self.w_n)
+
+    def _flush(self):
+        seed = np.asarray(self.seed, dtype="f8")
+        self.seed = []
+        shape = seed.shape[1:]
+        self.n = np.zeros(shape, dtype="u4")
+        self.mean = np.zeros(shape, dtype="f8")
+        self.m2 = np.zeros(shape, dtype="f8")
+        self.clipped = np.zeros(shape, dtype=bool)
+        self.w_n = 0  # every value, clipped ones counted at the threshold
+        self.w_mean = np.zeros(shape, dtype="f8")
+        self.w_m2 = np.zeros(shape, dtype="f8")
+        # the MAD is robust but noisy; only use it to screen out hits from the seed
+        median = np.median(seed, axis=0)
+        mad = 1.4826 * np.median(np.abs(seed - median), axis=0)
+        inside = seed - median <= self._scale(len(seed)) * np.maximum(mad, 1)
+        count = inside.sum(axis=0)
+        center = np.where(inside, seed, 0).sum(axis=0) / count
+        variance = np.where(inside, (seed - center) ** 2, 0).sum(axis=0) / np.maximum(count - 1, 1)
+        for frame in seed:
+            self._fold(frame, center, variance, count)
+
+    def _fold(self, frame, center, variance, count):
+        # variance floor of one count keeps quiet pixels from clipping on digitization noise
+        limit = center + self._scale(count) * np.sqrt(np.maximum(variance, 1))
+        keep = frame <= limit
+        self.clipped |= ~keep
+        # Welford update, accepted values only
+        self.n += keep
+        delta = frame - self.mean
+        self.mean += np.divide(delta, self.n, out=np.zeros_like(delta), where=keep)
+        self.m2 += np.where(keep, delta * (frame - self.mean), 0)
+        # Welford update, every value
+        value = np.minimum(frame, limit)
+        self.w_n += 1
+        delta = value - self.w_mean
+        self.w_mean += delta / self.w_n
+        self.w_m2 += delta * (value - self.w_mean)
+
+    def _scale(self, count):
+        """sigma, widened when the variance is estimated from count values
+
+        a noisy variance estimate calls for a wider threshold, as a Student t would,
+        and a new value also spreads around an estimated mean
+        """
+        count = np.maximum(count, 2)
+        return self.sigma * (1 + (self.sigma**2 + 1) / (4 * (count - 1))) * np.sqrt(1 + 1 / count)
+
+    def apply(self, stats, mean) -> np.ndarray:
+        if self.n is None and self.seed:  # fewer readouts than min_readouts
+            self._flush()
+        if self.n is None:
+            return np.zeros(mean.shape, dtype=bool)
+        # a pixel clipped in every frame keeps its plain mean
+        clipped = self.clipped & (self.n > 0)
+        mean[clipped] = self.mean[clipped]
+        return clipped
+
+    def correct_spread(self, stats, hot, variance, count):
+        """statistics of the accepted values only"""
+        n = self.n[hot]
+        with np.errstate(all="ignore"):
+            variance[hot] = self.m2[hot] / (n - 1.0)
+        count[hot] = n
+
+
+class TemporalMedian(MaxDrop):
+    """like max_drop, but compares against and substitutes a streaming estimate of the median
+
+    the estimate moves a shrinking step toward each new value, so a few hits barely move it
+    and pixels with several cosmic hits are still caught
+    """
+
+    def __init__(self, offset=400.0, ratio=3.0, floor=800.0, **kwargs):
+        super().__init__(offset, ratio, floor)
+        self.count = 0
+        self.median: np.ndarray | None = None
+
+    def update(self, frame):
+        self.count += 1
+        if self.median is None:
+            self.median = frame.astype("f8")
+            self.spread = np.zeros(frame.shape, dtype="f8")  # running mean absolute deviation
+            return
+        deviation = frame - self.median
+        self.spread += (np.abs(deviation) - self.spread) / self.count
+        self.median += 1.5 * self.spread / self.count * np.sign(deviation)
+
+    def apply(self, stats, mean) -> np.ndarray:
+        if stats.count <= 2 or self.median is None:
+            return np.zeros(mean.shape, dtype=bool)
+        hot = ((stats.max - self.offset) / (self.median - self.offset) > self.ratio) & (
+            stats.max > self.floor
+        )
+        mean[hot] = self.median[hot]
+        return hot
+
+
+_stages = {"max_drop": MaxDrop, "sigma_clip": SigmaClip, "median": TemporalMedian}
+
+
+def rejection_stage(config: dict):
+    """new rejection stage from the rejection config record; None when disabled"""
+    method = config["method"]
+    if method == "none":
+        return None
+    return _stages[method](**config)
+
+
+def new_stats(rejection: dict, variance: bool, classes: list[str], phase: int = 0):
+    """accumulator for one measurement: one per shot class, if readouts are demultiplexed"""
+
+    def make():
+        return RunningStats(rejection_stage(rejection), variance=variance)
+
+    if classes:
+        return ShotStats(classes, make, phase)
+    return make()
+
+
+def bin_image(image: np.ndarray, y_binning: int, x_binning: int, full_binning="none"):
+    """sum blocks of pixels, like on-chip binning
+
+    full_binning "vertical" sums every row (a 1D spectrum along x); "horizontal" sums every column
+    """
+    rows, columns = image.shape
+    out = image.reshape(rows // y_binning, y_binning, columns // x_binning, x_binning).sum(
+        axis=(1, 3)
+    )
+    if full_binning == "vertical":
+        return out.sum(axis=0)
+    if full_binning == "horizontal":
+        return out.sum(axis=1)
+    return out
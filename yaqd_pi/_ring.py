@@ -0,0 +1,35 @@
+"""
+preallocated circular buffer of frames
+frames are copied into reused slots instead of freshly allocated arrays
+"""
+
+__all__ = ["FrameRing"]
+
+import numpy as np
+
+
+class FrameRing:
+    """fixed number of frame slots, overwritten oldest-first
+
+    a slot returned by push stays valid until `size` more frames have been pushed
+    """
+
+    def __init__(self, size: int, dtype="u2"):
+        self.size = max(int(size), 1)
+        self.dtype = np.dtype(dtype)
+        self.frames = np.empty((self.size, 0, 0), dtype=self.dtype)
+        self._next = 0
+
+    def allocate(self, shape: tuple[int, ...]):
+        """(re)allocate slots for frames of the given shape"""
+        if self.frames.shape[1:] != tuple(shape):
+            self.frames = np.empty((self.size, *shape), dtype=self.dtype)
+            self._next = 0
+
+    def push(self, frame: np.ndarray) -> np.ndarray:
+        """copy frame into the next slot and return that slot"""
+        self.allocate(frame.shape)
+        slot = self.frames[self._next]
+        np.copyto(slot, frame)
+        self._next = (self._next + 1) % self.size
+        return slot
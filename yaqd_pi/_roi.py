@@ -9,6 +9,7 @@ this issue should be superceded with mappings...
 
 from collections import namedtuple
 
+import numpy as np
 
 ROI_native = namedtuple(
     "ROI_native",
@@ -22,25 +23,93 @@ ROI_UI = namedtuple(
 )
 
 
-def ui_to_native(roi: ROI_UI) -> ROI_native:
-    return ROI_native(
-        x=512 - roi.bottom,
-        y=roi.left,
-        width=roi.height,
-        height=roi.width,
-        x_binning=roi.y_binning,
-        y_binning=roi.x_binning,
-    )
-
-
-def native_to_ui(native: ROI_native) -> ROI_UI:
-    return ROI_UI(
-        **{
-            "left": native.y,
-            "width": native.height,
-            "bottom": 512 - native.x,
-            "height": native.width,
-            "x_binning": native.y_binning,
-            "y_binning": native.x_binning,
-        }
-    )
+class Geometry:
+    """sensor size, and the transform between camera (native) and channel (UI) coordinates
+
+    channels are camera frames rotated a quarter turn (np.rot90(frame, 1)):
+    channel rows run along camera x, reversed; channel columns run along camera y
+    """
+
+    rotation = 1  # quarter turns, as np.rot90
+
+    def __init__(self, sensor_width: int = 512, sensor_height: int = 512):
+        """camera pixels along camera x and y"""
+        self.sensor_width = int(sensor_width)
+        self.sensor_height = int(sensor_height)
+
+    @property
+    def full(self) -> ROI_UI:
+        """the whole sensor, unbinned"""
+        return ROI_UI(
+            bottom=self.sensor_width, left=0, width=self.sensor_height, height=self.sensor_width
+        )
+
+    def to_native(self, roi: ROI_UI) -> ROI_native:
+        return ROI_native(
+            x=self.sensor_width - roi.bottom,
+            y=roi.left,
+            width=roi.height,
+            height=roi.width,
+            x_binning=roi.y_binning,
+            y_binning=roi.x_binning,
+        )
+
+    def to_ui(self, native: ROI_native) -> ROI_UI:
+        return ROI_UI(
+            left=native.y,
+            width=native.height,
+            bottom=self.sensor_width - native.x,
+            height=native.width,
+            x_binning=native.y_binning,
+            y_binning=native.x_binning,
+        )
+
+    def orient(self, frame: np.ndarray) -> np.ndarray:
+        """view of a camera frame (or of a reduction of frames) oriented like the channels"""
+        return np.rot90(frame, self.rotation)
+
+    def shape(self, roi: ROI_UI) -> tuple[int, int]:
+        """(rows, columns) of the channel of roi"""
+        return roi.height // roi.y_binning, roi.width // roi.x_binning
+
+    def indices(self, roi: ROI_UI) -> tuple[np.ndarray, np.ndarray]:
+        """y_index (column) and x_index (row) mappings of the channel of roi
+
+        sensor coordinates of the first pixel of each bin
+        """
+        rows, columns = self.shape(roi)
+        y_start = roi.bottom - roi.height
+        y_index = np.arange(y_start, y_start + rows * roi.y_binning, roi.y_binning, dtype="i2")
+        x_index = np.arange(
+            roi.left, roi.left + columns * roi.x_binning, roi.x_binning, dtype="i2"
+        )
+        return y_index[:, None], x_index[None, :]
+
+
+# software sub-regions of the camera roi, in UI coordinates
+# binning is applied on top of the camera roi binning
+SubROI = namedtuple(
+    "SubROI",
+    ["name", "left", "width", "bottom", "height", "x_binning", "y_binning", "full_binning"],
+    defaults=[0, 512, 512, 512, 1, 1, "none"],
+)
+
+
+def sub_roi_slices(sub: SubROI, roi: ROI_UI) -> tuple[slice, slice]:
+    """(rows, columns) of the camera roi channel covered by sub
+
+    raises ValueError if sub is not inside roi, or does not bin evenly
+    """
+    x_binning = roi.x_binning * sub.x_binning
+    y_binning = roi.y_binning * sub.y_binning
+    left = sub.left - roi.left
+    top = (sub.bottom - sub.height) - (roi.bottom - roi.height)
+    if left < 0 or top < 0 or (left + sub.width > roi.width) or (top + sub.height > roi.height):
+        raise ValueError(f"sub roi {sub.name} is outside of the camera roi {roi}")
+    if left % roi.x_binning or top % roi.y_binning:
+        raise ValueError(f"sub roi {sub.name} does not align with binning")
+    if sub.width % x_binning or sub.height % y_binning:
+        raise ValueError(f"sub roi {sub.name} does not align with binning")
+    rows = slice(top // roi.y_binning, (top + sub.height) // roi.y_binning)
+    columns = slice(left // roi.x_binning, (left + sub.width) // roi.x_binning)
+    return rows, columns
@@ -0,0 +1,53 @@
+"""
+when readouts of an acquisition are expected to arrive
+waits on the SDK are sized to the next deadline instead of polling on a fixed interval
+"""
+
+__all__ = ["ReadoutSchedule"]
+
+import math
+import time
+
+
+class ReadoutSchedule:
+    """deadlines of the readouts of one acquisition attempt, from its start
+
+    readout n (from zero) is expected n + 1 periods after the start
+    a readout is overdue once `tolerance` times its expected delay, plus `slack`, has passed
+    """
+
+    def __init__(
+        self,
+        exposure_time: float,
+        readout_time: float,
+        frames_per_readout: int = 1,
+        tolerance: float = 1.2,
+        slack: float = 100.0,
+        trigger_period: float = 0.0,
+    ):
+        """times in ms; trigger_period is the time between external triggers, if frames wait for them"""
+        # an upper bound: in frame transfer mode the next exposure overlaps the readout
+        period = max(exposure_time + readout_time, trigger_period)
+        self.period = period * max(frames_per_readout, 1)
+        self.tolerance = tolerance
+        self.slack = slack
+        self._start = time.monotonic()
+
+    def start(self):
+        self._start = time.monotonic()
+
+    def expected(self, received: int) -> float:
+        """monotonic time (s) the next readout should arrive, after `received` readouts"""
+        return self._start + (received + 1) * self.period / 1e3
+
+    def deadline(self, received: int) -> float:
+        """monotonic time (s) after which the next readout is overdue"""
+        delay = (received + 1) * self.period * self.tolerance + self.slack
+        return self._start + delay / 1e3
+
+    def wait(self, received: int) -> int:
+        """ms to wait for the next readout: until its deadline"""
+        return max(math.ceil((self.deadline(received) - time.monotonic()) * 1e3), 1)
+
+    def overdue(self, received: int) -> bool:
+        return time.monotonic() >= self.deadline(received)
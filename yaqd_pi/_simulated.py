@@ -0,0 +1,429 @@
+"""
+simulated ProEM camera, for running the daemon without hardware or the PICam library
+implements the parts of instrumental's picam module (PicamCamera, its params and _dev) that PiProem uses
+frames are dark noise with hot pixels and cosmic rays, delivered at frame transfer timing
+a pump signal can be added to every other readout, in phase with external triggers when triggered
+timeouts (stalled acquisitions) and SDK errors can be injected at random
+"""
+
+__all__ = ["PicamError", "PicamEnums", "PicamCamera", "list_instruments"]
+
+import enum
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+
+class PicamError(Exception):
+    def __init__(self, msg, code=None):
+        super().__init__(msg)
+        self.code = code
+
+
+class _Enums:
+    Error = enum.IntEnum(
+        "Error",
+        {"None_": 0, "UnexpectedError": 4, "TimeOutOccurred": 32, "AcquisitionInProgress": 18},
+    )
+    AdcAnalogGain = enum.IntEnum("AdcAnalogGain", {"Low": 1, "Medium": 2, "High": 3})
+    AdcQuality = enum.IntEnum(
+        "AdcQuality", {"LowNoise": 1, "HighCapacity": 2, "HighSpeed": 4, "ElectronMultiplied": 3}
+    )
+    SensorTemperatureStatus = enum.IntEnum(
+        "SensorTemperatureStatus", {"Unlocked": 1, "Locked": 2, "Faulted": 3}
+    )
+    Model = enum.IntEnum("Model", {"ProEMHS512BExcelon": 1209})
+    TriggerSource = enum.IntEnum("TriggerSource", {"External": 1, "Internal": 2})
+    TriggerResponse = enum.IntEnum(
+        "TriggerResponse",
+        {
+            "NoResponse": 1,
+            "ReadoutPerTrigger": 2,
+            "ShiftPerTrigger": 3,
+            "ExposeDuringTriggerPulse": 4,
+            "StartOnSingleTrigger": 5,
+        },
+    )
+    TriggerDetermination = enum.IntEnum(
+        "TriggerDetermination",
+        {"PositivePolarity": 1, "NegativePolarity": 2, "RisingEdge": 3, "FallingEdge": 4},
+    )
+
+    def _get_enum_dict(self):
+        return {
+            k: getattr(self, k)
+            for k in [
+                "AdcAnalogGain",
+                "AdcQuality",
+                "SensorTemperatureStatus",
+                "TriggerSource",
+                "TriggerResponse",
+                "TriggerDetermination",
+            ]
+        }
+
+
+PicamEnums = _Enums()
+
+_analog_gain = {"Low": 0.25, "Medium": 1.0, "High": 4.0}  # counts per electron, roughly
+
+
+class Roi:
+    def __init__(self, x=0, y=0, width=512, height=512, x_binning=1, y_binning=1):
+        self.x, self.y, self.width, self.height = x, y, width, height
+        self.x_binning, self.y_binning = x_binning, y_binning
+
+    def copy(self):
+        return Roi(self.x, self.y, self.width, self.height, self.x_binning, self.y_binning)
+
+
+class Parameter:
+    def __init__(self, value, options=None, read_only=False):
+        self._value = value
+        self._options = options
+        self._read_only = read_only
+        self._param = ""  # name; stands in for the PicamParameter handle
+
+    def get_value(self):
+        return self._value
+
+    def set_value(self, value):
+        if self._read_only:
+            raise PicamError("parameter is read only", PicamEnums.Error.UnexpectedError)
+        if not self.can_set(value):
+            raise PicamError(f"cannot set {value}", PicamEnums.Error.UnexpectedError)
+        self._value = value
+
+    def can_set(self, value):
+        return not self._read_only and (self._options is None or value in self._options)
+
+
+class Reading(Parameter):
+    """read only parameter that follows the hardware
+
+    like PICam, get_value is the value as of the last commit; _dev reads it live
+    """
+
+    def __init__(self, read):
+        super().__init__(None, read_only=True)
+        self._read = read
+
+    def refresh(self):
+        self._value = self._read()
+
+
+class Parameters:
+    def __init__(self, sensor: int, temperature):
+        enums = PicamEnums
+        self.parameters = dict(
+            ExposureTime=Parameter(10.0),
+            ReadoutCount=Parameter(1),
+            AdcAnalogGain=Parameter(enums.AdcAnalogGain.Medium),
+            AdcQuality=Parameter(
+                enums.AdcQuality.LowNoise,
+                options=[enums.AdcQuality.LowNoise, enums.AdcQuality.ElectronMultiplied],
+            ),
+            AdcSpeed=Parameter(10.0, options=[0.1, 1.0, 5.0, 10.0]),
+            AdcEMGain=Parameter(1),
+            Rois=Parameter([Roi(0, 0, sensor, sensor)]),
+            SensorTemperatureSetPoint=Parameter(-70.0),
+            SensorTemperatureStatus=Reading(lambda: temperature()[1]),
+            SensorTemperatureReading=Reading(lambda: temperature()[0]),
+            PixelHeight=Parameter(16.0, read_only=True),  # um
+            PixelWidth=Parameter(16.0, read_only=True),
+            SensorActiveWidth=Parameter(sensor, read_only=True),
+            SensorActiveHeight=Parameter(sensor, read_only=True),
+            ReadoutTimeCalculation=Parameter(0.0, read_only=True),  # ms
+            FramesPerReadout=Parameter(1, read_only=True),
+            ReadoutStride=Parameter(2 * sensor * sensor, read_only=True),  # bytes
+            TriggerSource=Parameter(enums.TriggerSource.Internal),
+            TriggerResponse=Parameter(
+                enums.TriggerResponse.NoResponse,
+                options=[
+                    enums.TriggerResponse.NoResponse,
+                    enums.TriggerResponse.ReadoutPerTrigger,
+                    enums.TriggerResponse.ExposeDuringTriggerPulse,
+                    enums.TriggerResponse.StartOnSingleTrigger,
+                ],
+            ),
+            TriggerDetermination=Parameter(enums.TriggerDetermination.PositivePolarity),
+        )
+        for k, v in self.parameters.items():
+            v._param = k
+            setattr(self, k, v)
+
+
+AvailableData = namedtuple("AvailableData", ["readout_count", "frames"])
+AcquisitionStatus = namedtuple("AcquisitionStatus", ["running", "errors", "readout_rate"])
+_DATA_LOST = 0x2  # PicamAcquisitionErrorsMask_DataLost
+
+
+class _Device:
+    """acquisition control, like instrumental's wrapper of the PICam device handle"""
+
+    def __init__(self, camera: "PicamCamera"):
+        self.camera = camera
+        self.running = False
+        self.stalled = False
+        self._lock = threading.Lock()
+
+    def StartAcquisition(self):
+        with self._lock:
+            if self.running:
+                raise PicamError("acquisition in progress", PicamEnums.Error.AcquisitionInProgress)
+            committed = self.camera.committed
+            self.readout_count = committed["ReadoutCount"]  # 0 for an indefinite acquisition
+            self.period = max(committed["ExposureTime"], committed["ReadoutTimeCalculation"])
+            self.first = committed["ExposureTime"] + committed["ReadoutTimeCalculation"]
+            response = committed["TriggerResponse"].name
+            external = committed["TriggerSource"].name == "External"
+            if external and response in ["ReadoutPerTrigger", "ExposeDuringTriggerPulse"]:
+                self.period = max(self.period, 1e3 / self.camera.trigger_rate)
+            if external and response != "NoResponse":  # readout 0 follows the first trigger
+                self.first += 1e3 / self.camera.trigger_rate
+                self.camera.pump_phase = 0
+            else:  # free running; the pump is not synchronized
+                self.camera.pump_phase = int(self.camera.rng.integers(2))
+            self.delivered = 0
+            self.stalled = False
+            self.running = True
+            self.start = time.monotonic()
+
+    def StopAcquisition(self):
+        self.running = False
+
+    def IsAcquisitionRunning(self):
+        return self.running
+
+    def CanReadParameter(self, parameter):
+        return isinstance(self.camera.params.parameters[parameter], Reading)
+
+    def ReadParameterFloatingPointValue(self, parameter):
+        return float(self._read(parameter))
+
+    def ReadParameterIntegerValue(self, parameter):
+        return int(self._read(parameter))
+
+    def _read(self, parameter):
+        reading = self.camera.params.parameters[parameter]
+        if not isinstance(reading, Reading):
+            raise PicamError(f"{parameter} cannot be read", PicamEnums.Error.UnexpectedError)
+        return reading._read()
+
+    def WaitForAcquisitionUpdate(self, timeout):
+        """readouts that arrived since the last update; blocks up to timeout (ms) for the next"""
+        camera = self.camera
+        if not self.running:
+            return AvailableData(0, None), AcquisitionStatus(False, 0, 0.0)
+        if camera.rng.random() < camera.error_probability:
+            raise PicamError("injected error", PicamEnums.Error.UnexpectedError)
+        due = self.start + (self.first + self.delivered * self.period) / 1e3
+        if self.stalled or due - time.monotonic() > timeout / 1e3:
+            time.sleep(timeout / 1e3)
+            raise PicamError("timeout", PicamEnums.Error.TimeOutOccurred)
+        time.sleep(max(due - time.monotonic(), 0))
+        elapsed = (time.monotonic() - self.start) * 1e3 - self.first
+        count = int(elapsed // self.period) + 1 - self.delivered
+        if self.readout_count:
+            count = min(count, self.readout_count - self.delivered)
+        for i in range(count):
+            if camera.rng.random() < camera.stall_probability:  # this readout never arrives
+                self.stalled = True
+                count = i
+                break
+        # the buffer is circular: readouts it cannot hold were overwritten before they were read
+        lost = max(count - len(camera.buffer), 0)
+        frames = camera._frames(count - lost, self.delivered + lost)
+        self.delivered += count
+        if self.readout_count and self.delivered >= self.readout_count:
+            self.running = False
+        rate = 1e3 / self.period if self.period else 0.0
+        errors = _DATA_LOST if lost else 0
+        return AvailableData(count - lost, frames), AcquisitionStatus(self.running, errors, rate)
+
+
+class PicamCamera:
+    def __init__(
+        self,
+        sensor_size=512,
+        dark_level=500.0,
+        read_noise=5.0,
+        hot_pixel_fraction=1e-4,
+        hot_pixel_level=3000.0,
+        cosmic_ray_rate=0.5,
+        cosmic_ray_level=5000.0,
+        commit_time=50.0,
+        cooldown_time=0.0,
+        stall_probability=0.0,
+        error_probability=0.0,
+        seed=0,
+        buffer_count=64,
+        trigger_rate=1000.0,
+        pump_signal=0.0,
+    ):
+        """
+        dark_level: mean counts per unbinned pixel
+        read_noise: counts rms per binned pixel
+        cosmic_ray_rate: mean cosmic rays per full-sensor frame
+        commit_time: ms to commit parameters
+        cooldown_time: s for the sensor to reach its set point after start
+        stall_probability: chance that a readout never arrives, until the acquisition is restarted
+        error_probability: chance that a wait raises an unexpected PicamError
+        buffer_count: readouts the acquisition buffer holds, unless one is set (set_acquisition_buffer);
+            readouts that arrive while it is full are lost
+        trigger_rate: Hz of the external trigger input
+        pump_signal: counts added to every other readout, as by a pump chopped at half the trigger rate
+        """
+        self.params = Parameters(sensor_size, self._temperature)
+        self.sensor_size = sensor_size
+        self.dark_level = dark_level
+        self.read_noise = read_noise
+        self.hot_pixel_fraction = hot_pixel_fraction
+        self.hot_pixel_level = hot_pixel_level
+        self.cosmic_ray_rate = cosmic_ray_rate
+        self.cosmic_ray_level = cosmic_ray_level
+        self.commit_time = commit_time
+        self.stall_probability = stall_probability
+        self.error_probability = error_probability
+        self.trigger_rate = trigger_rate
+        self.pump_signal = pump_signal
+        self.pump_phase = 0  # readouts n with (n + pump_phase) even are pumped
+        self.rng = np.random.default_rng(seed)
+        self.buffer = np.empty((buffer_count, 0, 0), dtype="u2")
+        self._memory: np.ndarray | None = None  # set by set_acquisition_buffer
+        self._bank = np.empty((0, 0, 0), dtype="u2")
+        self._bank_key: tuple | None = None
+        self._cooldown = (time.monotonic(), 20.0, cooldown_time)
+        self._hot = self.rng.random((sensor_size, sensor_size)) < hot_pixel_fraction
+        self._dev = _Device(self)
+        self.committed = {"SensorTemperatureSetPoint": -70.0}
+        self.commit_parameters()
+
+    def commit_parameters(self):
+        if self._dev.running:
+            raise PicamError("acquisition in progress", PicamEnums.Error.AcquisitionInProgress)
+        roi = self.params.Rois.get_value()[0]
+        if (
+            roi.x < 0
+            or roi.y < 0
+            or roi.x + roi.width > self.sensor_size
+            or roi.y + roi.height > self.sensor_size
+            or roi.width % roi.x_binning
+            or roi.height % roi.y_binning
+        ):
+            raise PicamError(f"invalid roi {vars(roi)}", PicamEnums.Error.UnexpectedError)
+        time.sleep(self.commit_time / 1e3)
+        pixels = (roi.width // roi.x_binning) * (roi.height // roi.y_binning)
+        readout_time = pixels / self.params.AdcSpeed.get_value() / 1e3 + 0.5  # ms
+        self.params.ReadoutTimeCalculation._value = readout_time
+        self.params.ReadoutStride._value = 2 * pixels
+        self.committed = {k: v.get_value() for k, v in self.params.parameters.items()}
+        for k, v in self.params.parameters.items():
+            if isinstance(v, Reading):  # with the new set point
+                v.refresh()
+                self.committed[k] = v.get_value()
+        self.committed["Rois"] = [roi.copy()]
+        self._make_bank()
+
+    def _temperature(self):
+        """reading, and status: the sensor cools exponentially toward the committed set point"""
+        start, initial, cooldown = self._cooldown
+        target = self.committed["SensorTemperatureSetPoint"]
+        elapsed = time.monotonic() - start
+        reading = target + (initial - target) * np.exp(-elapsed / cooldown) if cooldown else target
+        status = PicamEnums.SensorTemperatureStatus
+        locked = abs(reading - target) < 0.5
+        return round(float(reading), 2), status.Locked if locked else status.Unlocked
+
+    def _make_bank(self):
+        """dark frames of the committed roi, cycled through during acquisition"""
+        roi = self.committed["Rois"][0]
+        key = (tuple(vars(roi).values()), self.committed["AdcAnalogGain"])
+        if key == self._bank_key:
+            return
+        self._bank_key = key
+        shape = (roi.height // roi.y_binning, roi.width // roi.x_binning)
+        binned = roi.x_binning * roi.y_binning
+        gain = _analog_gain[self.committed["AdcAnalogGain"].name]
+        mean = self.dark_level * binned * gain
+        bank = self.rng.poisson(mean, size=(16, *shape)).astype("f8")
+        bank += self.rng.normal(0, self.read_noise, size=bank.shape)
+        hot = self._hot[roi.y : roi.y + roi.height, roi.x : roi.x + roi.width]
+        hot = hot.reshape(shape[0], roi.y_binning, shape[1], roi.x_binning).any(axis=(1, 3))
+        bank[:, hot] += self.hot_pixel_level
+        self._bank = np.clip(bank, 0, 65535).astype("u2")
+        self._bank_index = 0
+        self._cosmic_rate = self.cosmic_ray_rate * (roi.width * roi.height) / self.sensor_size**2
+        self._view_buffer()
+
+    def set_acquisition_buffer(self, memory: np.ndarray):
+        """acquire into memory, whole readouts of the committed roi, like PicamAdvanced_SetAcquisitionBuffer"""
+        if self._dev.running:
+            raise PicamError("acquisition in progress", PicamEnums.Error.AcquisitionInProgress)
+        if memory.nbytes < self.params.ReadoutStride.get_value():
+            raise PicamError("buffer smaller than a readout", PicamEnums.Error.UnexpectedError)
+        self._memory = memory
+        self._view_buffer()
+
+    def _view_buffer(self):
+        roi = self.committed["Rois"][0]
+        shape = (roi.height // roi.y_binning, roi.width // roi.x_binning)
+        if self._memory is None:
+            if self.buffer.shape[1:] != shape:
+                self.buffer = np.empty((len(self.buffer), *shape), dtype="u2")
+            return
+        count = self._memory.nbytes // (2 * shape[0] * shape[1])
+        self.buffer = (
+            self._memory[: count * 2 * shape[0] * shape[1]].view("u2").reshape(count, *shape)
+        )
+
+    def _frames(self, count, first=0):
+        """next count frames (readouts first, first + 1, ...), written into the acquisition buffer"""
+        out = self.buffer[:count]
+        for i, frame in enumerate(out):
+            np.copyto(frame, self._bank[self._bank_index])
+            self._bank_index = (self._bank_index + 1) % len(self._bank)
+            if self.pump_signal and (first + i + self.pump_phase) % 2 == 0:
+                np.minimum(frame, 65535 - int(self.pump_signal), out=frame)
+                frame += int(self.pump_signal)
+            for _ in range(self.rng.poisson(self._cosmic_rate)):
+                y, x = (self.rng.integers(n) for n in frame.shape)
+                frame[y, x] = min(int(frame[y, x]) + self.cosmic_ray_level, 65535)
+        return out
+
+    def set_roi(self, x=None, y=None, width=None, height=None, x_binning=None, y_binning=None):
+        roi = self.params.Rois.get_value()[0].copy()
+        for key, value in dict(
+            x=x, y=y, width=width, height=height, x_binning=x_binning, y_binning=y_binning
+        ).items():
+            if value is not None:
+                setattr(roi, key, value)
+        self.params.Rois.set_value([roi])
+
+    def _extract_available_data(self, available_data, copy=True):
+        """readouts[readout][frame][roi]; without copy, arrays are valid until the next update"""
+        frames = available_data.frames
+        if copy:
+            frames = frames.copy()
+        return [[[frame]] for frame in frames[: available_data.readout_count]]
+
+    def close(self):
+        self._dev.running = False
+
+
+class _Instrument:
+    def __init__(self, serial: str, settings: dict):
+        self.serial = serial
+        self.settings = settings
+
+    def __getitem__(self, key):
+        return {"serial": self.serial, "model": "ProEMHS512BExcelon"}[key]
+
+    def create(self) -> PicamCamera:
+        return PicamCamera(**self.settings)
+
+
+def list_instruments(serial="SIM0", **settings):
+    return [_Instrument(serial, settings)]
@@ -0,0 +1,36 @@
+"""
+wavelength mapping of a grating spectrometer imaged onto the sensor
+see README for the grating equation and sign conventions
+"""
+
+__all__ = ["wavelengths"]
+
+import functools
+
+import numpy as np
+
+
+@functools.lru_cache(maxsize=32)
+def wavelengths(
+    gpmm: float,
+    grating_aoi_deg: float,
+    focal_length: float,
+    position_offset: float,
+    order: int,
+    mm_per_pixel: float,
+    start: int,
+    pixels: int,
+    binning: int,
+) -> np.ndarray:
+    """wavelength (nm) at the center of each binned pixel along the dispersion axis
+
+    start and pixels are in unbinned sensor pixels; position_offset (mm) is the position of
+    sensor pixel 0 relative to the lens axis.  Results are cached and must not be modified.
+    """
+    groove_spacing = 1e6 / gpmm  # nm
+    centers = start + (np.arange(pixels // binning) + 0.5) * binning - 0.5
+    position = centers * mm_per_pixel + position_offset  # mm
+    diffracted = np.arctan(position / focal_length)
+    out = groove_spacing / order * (np.sin(np.radians(grating_aoi_deg)) - np.sin(diffracted))
+    out.flags.writeable = False
+    return out
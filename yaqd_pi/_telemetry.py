@@ -0,0 +1,53 @@
+"""
+sensor and acquisition health, sampled in the background into a fixed-size ring
+property reads are served from the latest sample, so they never wait on the SDK
+"""
+
+__all__ = ["Telemetry"]
+
+import collections
+import time
+
+import numpy as np
+
+# health counters accumulated from the timing report of every measurement
+_COUNTED = ["timeouts", "retries", "dropped_readouts"]
+
+
+class Telemetry:
+    """the last `size` samples of each field; `time` (Unix time, s) is added to every sample
+
+    counters (measurements, errors, and _COUNTED) are totals since startup, sampled like the rest
+    """
+
+    def __init__(self, size: int, fields: list[str]):
+        self.size = max(int(size), 1)
+        self.fields = ["time", *fields, "measurements", "errors", *_COUNTED]
+        self.totals: collections.Counter[str] = collections.Counter()
+        self.latest: dict[str, float] = {}
+        self._table = np.full((self.size, len(self.fields)), np.nan)
+        self._next = 0
+        self._count = 0
+
+    def add_measurement(self, report: dict[str, float]):
+        self.totals["measurements"] += 1
+        for name in _COUNTED:
+            self.totals[name] += int(report.get(name, 0))
+
+    def add_error(self):
+        self.totals["errors"] += 1
+
+    def sample(self, **values: float):
+        """record values (fields not given are NaN) with the current counters"""
+        values = {"time": time.time(), **values}
+        values.update({name: float(self.totals[name]) for name in ["measurements", "errors"]})
+        values.update({name: float(self.totals[name]) for name in _COUNTED})
+        self._table[self._next] = [values.get(name, np.nan) for name in self.fields]
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+        self.latest = {name: float(v) for name, v in values.items()}
+
+    def history(self) -> dict[str, np.ndarray]:
+        """each field over the samples held, oldest first"""
+        rows = np.roll(self._table, -self._next, axis=0)[self.size - self._count :]
+        return {name: rows[:, i].copy() for i, name in enumerate(self.fields)}
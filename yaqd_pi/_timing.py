@@ -0,0 +1,72 @@
+"""
+per-measurement timing of acquisition phases, and rolling statistics over recent measurements
+"""
+
+__all__ = ["MeasurementTiming", "TimingHistory"]
+
+import collections
+import contextlib
+import time
+
+import numpy as np
+
+
+class MeasurementTiming:
+    """phase durations (s) and event counts of one measurement
+
+    phases may be entered many times (e.g. every wait for readouts); durations accumulate
+    """
+
+    def __init__(self):
+        self.phases: collections.defaultdict[str, float] = collections.defaultdict(float)
+        self.counts: collections.defaultdict[str, int] = collections.defaultdict(int)
+        self.times: dict[str, float] = {}  # Unix time (s) of events, kept out of the history
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    def as_dict(self) -> dict[str, float]:
+        out = {name: float(v) for name, v in self.phases.items()}
+        out.update({name: float(v) for name, v in self.counts.items()})
+        out["total"] = time.perf_counter() - self._start
+        acquiring = self.phases.get("acquire") or self.phases.get("window")
+        if acquiring:
+            out["frames_per_second"] = self.counts["frames"] / acquiring
+        return out
+
+
+class TimingHistory:
+    """the last `size` measurement timings, summarized on request"""
+
+    def __init__(self, size: int):
+        self._history: collections.deque[dict[str, float]] = collections.deque(maxlen=size)
+
+    def add(self, timing: dict[str, float]):
+        self._history.append(timing)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """last measurement, and mean, median, 90th percentile, and max of each quantity
+
+        quantities missing from some measurements (e.g. only in continuous mode) are ignored there
+        """
+        if not self._history:
+            return {}
+        keys = sorted(set().union(*self._history))
+        table = np.array([[t.get(k, np.nan) for k in keys] for t in self._history])
+        with np.errstate(all="ignore"):
+            rows = {
+                "mean": np.nanmean(table, axis=0),
+                "p50": np.nanpercentile(table, 50, axis=0),
+                "p90": np.nanpercentile(table, 90, axis=0),
+                "max": np.nanmax(table, axis=0),
+            }
+        out = {"last": dict(self._history[-1])}
+        out.update({stat: dict(zip(keys, map(float, row))) for stat, row in rows.items()})
+        out["count"] = {"measurements": float(len(self._history))}
+        return out
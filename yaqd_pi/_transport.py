@@ -0,0 +1,42 @@
+"""
+compact, encode-once arrays for get_measured
+yaq serializes an ndarray through its tobytes on every request; a FrozenArray computes those bytes once
+"""
+
+__all__ = ["FrozenArray", "freeze", "quantize"]
+
+import numpy as np
+
+
+class FrozenArray(np.ndarray):
+    """read-only, C-contiguous array whose bytes are cached on first use"""
+
+    _bytes: bytes | None = None
+
+    def __array_finalize__(self, obj):
+        self._bytes = None
+
+    def tobytes(self, order="C"):
+        if order != "C" or self.flags.writeable:
+            return super().tobytes(order)
+        if self._bytes is None:
+            self._bytes = super().tobytes()
+        return self._bytes
+
+
+def freeze(array: np.ndarray, dtype=None) -> FrozenArray:
+    """contiguous (e.g. not a rotated view) read-only copy of array"""
+    out = np.array(array, dtype=dtype, order="C").view(FrozenArray)
+    out.flags.writeable = False
+    return out
+
+
+def quantize(array: np.ndarray, dtype) -> tuple[FrozenArray, float, float]:
+    """unsigned integer codes, scale, and offset such that array ~ codes * scale + offset"""
+    dtype = np.dtype(dtype)
+    finite = array[np.isfinite(array)]
+    low = float(finite.min()) if finite.size else 0.0
+    high = float(finite.max()) if finite.size else 0.0
+    scale = (high - low) / np.iinfo(dtype).max or 1.0
+    codes = np.rint((np.nan_to_num(array, nan=low) - low) / scale)
+    return freeze(codes, dtype), scale, low
@@ -0,0 +1,39 @@
+"""
+a single thread that owns every blocking PICam call
+the event loop hands work to it and awaits the result, so RPC stays responsive during acquisition
+"""
+
+__all__ = ["AcquisitionWorker"]
+
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class AcquisitionWorker:
+    def __init__(self, name: str):
+        # one thread only: PICam calls for a camera are serialized, never interleaved
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-picam")
+        self._futures: set[Future] = set()  # submitted, not yet done
+        self._closed = False
+
+    async def run(self, func, *args, **kwargs):
+        """run func on the worker thread and await its result"""
+        future = self._executor.submit(func, *args, **kwargs)
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        return await asyncio.wrap_future(future)
+
+    def close(self, final=None):
+        """cancel queued calls, wait for the one in progress, then run final on the thread
+
+        blocks until the thread has exited; raises what final raised
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for future in list(self._futures):
+            future.cancel()  # only calls that have not started
+        last = self._executor.submit(final) if final is not None else None
+        self._executor.shutdown(wait=True)
+        if last is not None:
+            last.result()